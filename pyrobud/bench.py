@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import telethon as tg
+import tomlkit
+
+from . import listener, logs, module, util
+from .command import Command, Context
+from .replay import ReplayBot, load_config
+
+if TYPE_CHECKING:
+    from .core import Bot
+
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "config.example.toml"
+
+CHAT_ID_BASE = 1_000_000
+SENDER_ID_BASE = 2_000_000
+
+
+class ProbeModule(module.Module):
+    name: ClassVar[str] = "Benchmark Probe"
+
+    fed_times: MutableMapping[int, float]
+    latencies: List[float]
+    command_latencies: List[float]
+    last_command: Optional[Tuple[Command, tg.events.NewMessage.Event]]
+
+    def __init__(self, bot: "Bot") -> None:
+        super().__init__(bot)
+
+        self.fed_times = {}
+        self.latencies = []
+        self.command_latencies = []
+        self.last_command = None
+
+    def _record(self, msg_id: int, latencies: List[float]) -> None:
+        fed_time = self.fed_times.get(msg_id)
+        if fed_time is not None:
+            latencies.append(self.bot.loop.time() - fed_time)
+
+    # Run after all other listeners to measure the time taken by all of them
+    @listener.priority(10000)
+    async def on_message(self, msg: tg.events.NewMessage.Event) -> None:
+        self._record(msg.id, self.latencies)
+
+    async def on_command(self, cmd: Command, msg: tg.events.NewMessage.Event) -> None:
+        self._record(msg.id, self.command_latencies)
+        self.last_command = (cmd, msg)
+
+
+def _percentiles(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+
+    values = sorted(values)
+
+    def _pct(p: float) -> float:
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))] * 1000, 3)
+
+    return {"p50": _pct(50), "p90": _pct(90), "p99": _pct(99), "max": _pct(100)}
+
+
+def _allocations_per_object(
+    factory: Callable[[], Any], count: int = 1000
+) -> Dict[str, float]:
+    # Keep all objects alive so that everything they allocate shows up in the diff
+    objects = [None] * count
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for i in range(count):
+            objects[i] = factory()
+
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    return {
+        "blocks": round(sum(stat.count_diff for stat in stats) / count, 2),
+        "bytes": round(sum(stat.size_diff for stat in stats) / count, 1),
+    }
+
+
+def _measure_allocations(bot: "Bot", probe: ProbeModule) -> Dict[str, Any]:
+    results = {
+        "listener": _allocations_per_object(
+            lambda: listener.Listener("message", probe.on_message, probe, 100)
+        ),
+    }
+
+    if probe.last_command is not None:
+        cmd, msg = probe.last_command
+        invoker = cmd.name
+
+        def make_context() -> Context:
+            ctx = Context(
+                bot, msg, msg.message, invoker, len(bot.prefix) + len(invoker) + 1
+            )
+            # Include the lazily parsed arguments that most commands use
+            ctx.args  # skipcq: PYL-W0104
+            return ctx
+
+        results["command"] = _allocations_per_object(
+            lambda: Command(cmd.name, cmd.module, cmd.func)
+        )
+        results["context"] = _allocations_per_object(make_context)
+
+    return results
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes while macOS reports bytes
+    if sys.platform == "darwin":
+        peak //= 1024
+
+    return round(peak / 1024, 1)
+
+
+def _make_updates(
+    args: argparse.Namespace, user: tg.types.User, prefix: str
+) -> List[util.replay.RecordedUpdate]:
+    rng = random.Random(args.seed)
+
+    chats = [
+        tg.types.Channel(
+            id=CHAT_ID_BASE + i,
+            title=f"Chat {i}",
+            photo=tg.types.ChatPhotoEmpty(),
+            date=None,
+            megagroup=True,
+            access_hash=i,
+        )
+        for i in range(args.chats)
+    ]
+    senders = [
+        tg.types.User(id=SENDER_ID_BASE + i, first_name=f"User {i}", access_hash=i)
+        for i in range(args.chats)
+    ]
+
+    updates = []
+    for i in range(args.warmup + args.messages):
+        chat_idx = rng.randrange(args.chats)
+        if rng.random() < args.command_ratio:
+            text = prefix + args.command
+            sender_id = user.id
+            out = True
+        else:
+            text = f"Benchmark message {i}"
+            sender_id = senders[chat_idx].id
+            out = False
+
+        msg = tg.types.Message(
+            id=i + 1,
+            peer_id=tg.types.PeerChannel(chats[chat_idx].id),
+            date=None,
+            message=text,
+            out=out,
+            from_id=tg.types.PeerUser(sender_id),
+        )
+        update = tg.types.UpdateNewChannelMessage(msg, i + 1, 1)
+
+        # The replay client keeps entities around, so they only need to be sent once
+        entities = [*chats, *senders] if i == 0 else []
+        offset = (i - args.warmup) / args.rate if args.rate > 0 else 0.0
+        updates.append(util.replay.RecordedUpdate(offset, update, entities))
+
+    return updates
+
+
+async def _feed(
+    bot: ReplayBot,
+    updates: Sequence[util.replay.RecordedUpdate],
+    rate: float,
+    fed_times: MutableMapping[int, float],
+) -> None:
+    loop = asyncio.get_event_loop()
+    start_time = loop.time()
+
+    for recorded in updates:
+        if rate > 0:
+            delay = start_time + recorded.time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+
+        fed_times[recorded.update.message.id] = loop.time()
+        bot.client.feed(recorded)
+
+    await bot.client.join()
+    await bot.dispatch_engine.join()
+
+
+async def _run(args: argparse.Namespace, tmp_dir: Path) -> Dict[str, Any]:
+    config = await load_config(args.config_path, tmp_dir)
+    for option in args.option:
+        key, _, value = option.partition("=")
+        section, _, name = key.partition(".")
+        config[section][name] = tomlkit.parse(f"value = {value}")["value"]
+
+    user = tg.types.User(
+        id=SENDER_ID_BASE - 1, is_self=True, first_name="Benchmark", access_hash=0
+    )
+    bot = ReplayBot(config, user)
+
+    # Count all tasks created while the benchmark runs
+    loop = asyncio.get_event_loop()
+    tasks_created = 0
+
+    def task_factory(
+        _loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any
+    ) -> asyncio.Task:
+        nonlocal tasks_created
+
+        tasks_created += 1
+        return asyncio.Task(coro, loop=_loop, **kwargs)
+
+    try:
+        await bot.start()
+        bot.load_module(ProbeModule)
+        probe = bot.modules[ProbeModule.name]
+        assert isinstance(probe, ProbeModule)
+
+        updates = _make_updates(args, user, bot.prefix)
+        await _feed(bot, updates[: args.warmup], 0, {})
+
+        tasks_created = 0
+        loop.set_task_factory(task_factory)
+        start_time = loop.time()
+        await _feed(bot, updates[args.warmup :], args.rate, probe.fed_times)
+        elapsed = loop.time() - start_time
+        loop.set_task_factory(None)
+
+        engine = bot.dispatch_engine
+        db_executor = bot.db_executor
+        return {
+            "commit": util.version.get_commit(),
+            "params": {
+                "messages": args.messages,
+                "chats": args.chats,
+                "rate": args.rate,
+                "command_ratio": args.command_ratio,
+                "command": args.command,
+                "seed": args.seed,
+                "options": args.option,
+            },
+            "messages": args.messages,
+            "elapsed_sec": round(elapsed, 4),
+            "events_per_sec": round(args.messages / elapsed, 1),
+            "latency_ms": _percentiles(probe.latencies),
+            "command_latency_ms": _percentiles(probe.command_latencies),
+            "tasks_created": tasks_created,
+            "tasks_per_event": round(tasks_created / args.messages, 2),
+            "peak_rss_mb": _peak_rss_mb(),
+            "dispatch": {
+                "processed": engine.processed,
+                "shed": engine.total_shed,
+                "peak_queue_depth": engine.peak_queue_depth,
+            },
+            "db_executor": {
+                "operations": db_executor.completed,
+                "wakeups": db_executor.wakeups,
+                "peak_queue_depth": db_executor.max_depth,
+                "max_wait_ms": round(db_executor.max_wait * 1000, 3),
+            },
+            "requests": dict(bot.client.requests),
+            "allocations_per_object": _measure_allocations(bot, probe),
+        }
+    finally:
+        loop.set_task_factory(None)
+        if not bot.stopping:
+            await bot.stop()
+
+
+def main() -> None:
+    """Main entry point for the dispatch throughput benchmark."""
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark event dispatch with a synthetic stream of messages."
+    )
+    parser.add_argument(
+        "-n", "--messages", type=int, default=5000, help="number of messages to send"
+    )
+    parser.add_argument(
+        "--chats", type=int, default=50, help="number of chats to spread messages over"
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        type=float,
+        default=0,
+        help="messages per second to send, or 0 for unlimited",
+    )
+    parser.add_argument(
+        "--command-ratio",
+        type=float,
+        default=0.05,
+        help="fraction of messages that are outgoing commands",
+    )
+    parser.add_argument(
+        "--command",
+        type=str,
+        default="echo benchmark",
+        help="command to invoke, without the prefix",
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=200, help="number of unmeasured messages to send"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed for the generated message stream"
+    )
+    parser.add_argument(
+        "-c",
+        "--config-path",
+        metavar="PATH",
+        type=str,
+        default=str(DEFAULT_CONFIG_PATH),
+        help="config file to use (defaults to the example config)",
+    )
+    parser.add_argument(
+        "-o",
+        "--option",
+        metavar="SECTION.KEY=VALUE",
+        action="append",
+        default=[],
+        help="override a config option with a TOML value, e.g. dispatch.shards=4",
+    )
+    parser.add_argument(
+        "--output", metavar="PATH", type=str, help="file to write JSON results to"
+    )
+    args = parser.parse_args()
+
+    logs.setup_logging()
+    logging.root.setLevel(logging.WARNING)
+
+    # Use RAM-backed storage where possible to keep disk I/O out of the results
+    shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    with tempfile.TemporaryDirectory(prefix="pyrobud-bench-", dir=shm_dir) as tmp_dir:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            # Keep stdout clean for the results
+            with contextlib.redirect_stdout(sys.stderr):
+                results = loop.run_until_complete(_run(args, Path(tmp_dir)))
+        finally:
+            loop.close()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
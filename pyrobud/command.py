@@ -1,4 +1,22 @@
-from typing import TYPE_CHECKING, Any, Callable, Coroutine, Optional, Sequence, Union
+import asyncio
+import collections
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import telethon as tg
 
@@ -10,9 +28,17 @@ if TYPE_CHECKING:
 CommandFunc = Union[
     Callable[..., Coroutine[Any, Any, None]],
     Callable[..., Coroutine[Any, Any, Optional[str]]],
+    Callable[..., Coroutine[Any, Any, Sequence[str]]],
 ]
 Decorator = Callable[[CommandFunc], CommandFunc]
 
+# Key of the command stored on a trie node, which can never be a character
+_TRIE_COMMAND = ""
+
+# Bounds of the adaptive interval between status message edits, in seconds
+STATUS_MIN_INTERVAL = 2
+STATUS_MAX_INTERVAL = 60
+
 
 def desc(_desc: str) -> Decorator:
     """Sets description on a command function."""
@@ -46,13 +72,207 @@ def alias(*aliases: str) -> Decorator:
     return alias_decorator
 
 
+def background(func: CommandFunc) -> CommandFunc:
+    """Runs invocations of a command function as background jobs.
+
+    Jobs can be listed and cancelled while they run, and they can report their progress
+    through Context.set_progress().
+    """
+
+    setattr(func, "_cmd_background", True)
+    return func
+
+
+def cacheable(ttl: float = 300) -> Decorator:
+    """Caches the responses of a command function for the given time in seconds.
+
+    Only commands whose responses depend solely on their input and registered commands
+    should be cached. Cached responses are dropped when commands change, and a TTL of
+    0 keeps them until then.
+    """
+
+    def cacheable_decorator(func: CommandFunc) -> CommandFunc:
+        setattr(func, "_cmd_cache_ttl", ttl)
+        return func
+
+    return cacheable_decorator
+
+
+def limit(
+    max_concurrency: int = 1,
+    queue_size: int = 5,
+    calls: int = 0,
+    period: float = 0,
+    group: Optional[str] = None,
+) -> Decorator:
+    """Limits concurrent invocations and the rate of invocations of a command function.
+
+    Invocations beyond the concurrency limit wait in a queue of the given size, and
+    invocations are rejected if the queue is full. If calls is set, no more than that
+    many invocations can start per period (in seconds), and invocations beyond that
+    wait in the same queue. Commands in the same group share their limits; the first
+    command registered in a group defines them.
+    """
+
+    def limit_decorator(func: CommandFunc) -> CommandFunc:
+        setattr(
+            func, "_cmd_limit", CommandLimit(max_concurrency, queue_size, calls, period)
+        )
+        setattr(func, "_cmd_limit_group", group)
+        return func
+
+    return limit_decorator
+
+
+class CommandLimit(NamedTuple):
+    # Zero disables each limit, except for queue size where it disables queueing
+    max_concurrency: int
+    queue_size: int
+    calls: int
+    period: float
+
+
+class CommandLimiter:
+    """Enforces a CommandLimit on the invocations of one or more commands.
+
+    Queued invocations are started in the order they arrived, once both the
+    concurrency and rate limits allow it.
+    """
+
+    limit: CommandLimit
+    running: int
+
+    def __init__(self, _limit: CommandLimit) -> None:
+        self.limit = _limit
+        self.running = 0
+
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        self._starts: Deque[float] = collections.deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def full(self) -> bool:
+        return not self._has_slot() and len(self._waiters) >= self.limit.queue_size
+
+    def _has_concurrency(self) -> bool:
+        if self.limit.max_concurrency <= 0:
+            return True
+
+        return self.running < self.limit.max_concurrency
+
+    def _rate_delay(self) -> float:
+        """Returns the number of seconds until the rate limit allows another start."""
+
+        if self.limit.calls <= 0:
+            return 0
+
+        now = asyncio.get_event_loop().time()
+        while self._starts and self._starts[0] <= now - self.limit.period:
+            self._starts.popleft()
+
+        if len(self._starts) < self.limit.calls:
+            return 0
+
+        return self._starts[0] + self.limit.period - now
+
+    def _has_slot(self) -> bool:
+        return self._has_concurrency() and self._rate_delay() <= 0
+
+    def _take_slot(self) -> None:
+        self.running += 1
+        if self.limit.calls > 0:
+            self._starts.append(asyncio.get_event_loop().time())
+
+    async def acquire(
+        self, on_queued: Optional[Callable[[int], Awaitable[Any]]] = None
+    ) -> None:
+        """Waits for a slot to run in, calling on_queued first if it has to wait.
+
+        on_queued is called with the queue position. Callers must check that the
+        limiter isn't full.
+        """
+
+        if not self._waiters and self._has_slot():
+            self._take_slot()
+            return
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        self._process()
+
+        try:
+            if on_queued is not None and not waiter.done():
+                await on_queued(len(self._waiters))
+
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # We were handed a slot that we can no longer use
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+
+            raise
+
+    def _process(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Hand free slots to the next invocations in the queue
+        while self._waiters and self._has_concurrency():
+            waiter = self._waiters[0]
+            if waiter.done():
+                # Cancelled while waiting
+                self._waiters.popleft()
+                continue
+
+            delay = self._rate_delay()
+            if delay > 0:
+                # Come back when the oldest start leaves the rate limit period
+                self._timer = asyncio.get_event_loop().call_later(delay, self._process)
+                return
+
+            self._waiters.popleft()
+            self._take_slot()
+            waiter.set_result(None)
+
+    def release(self) -> None:
+        self.running -= 1
+        self._process()
+
+
 class Command:
+    __slots__ = (
+        "name",
+        "desc",
+        "usage",
+        "usage_optional",
+        "usage_reply",
+        "aliases",
+        "limit",
+        "limit_group",
+        "cache_ttl",
+        "background",
+        "module",
+        "func",
+    )
+
     name: str
     desc: str
     usage: str
     usage_optional: bool
     usage_reply: bool
     aliases: Sequence[str]
+    limit: Optional[CommandLimit]
+    limit_group: str
+    cache_ttl: Optional[float]
+    background: bool
     module: Any
     func: CommandFunc
 
@@ -63,43 +283,279 @@ class Command:
         self.usage_optional = getattr(func, "_cmd_usage_optional", False)
         self.usage_reply = getattr(func, "_cmd_usage_reply", False)
         self.aliases = getattr(func, "_cmd_aliases", [])
+        self.limit = getattr(func, "_cmd_limit", None)
+        self.limit_group = getattr(func, "_cmd_limit_group", None) or name
+        self.cache_ttl = getattr(func, "_cmd_cache_ttl", None)
+        self.background = getattr(func, "_cmd_background", False)
         self.module = mod
         self.func = func
 
 
+class CommandTrie:
+    """Prefix tree of command names and aliases for matching invocations.
+
+    Matching only scans the command name at the start of a message, so the cost of
+    checking a message doesn't depend on its length.
+    """
+
+    root: Dict[str, Any]
+
+    def __init__(self, commands: Mapping[str, Command]) -> None:
+        self.root = {}
+
+        for name, cmd in commands.items():
+            node = self.root
+            for char in name:
+                node = node.setdefault(char, {})
+
+            node[_TRIE_COMMAND] = cmd
+
+    def match(self, text: str, start: int = 0) -> Optional[Tuple[Command, int]]:
+        """Matches the command named at the given offset in the text.
+
+        Returns the command and the offset where its name ends, or None if the name
+        isn't followed by whitespace or the end of the text.
+        """
+
+        node = self.root
+        end = start
+        length = len(text)
+
+        while end < length:
+            char = text[end]
+            if char.isspace():
+                break
+
+            try:
+                node = node[char]
+            except KeyError:
+                return None
+
+            end += 1
+
+        cmd = node.get(_TRIE_COMMAND)
+        if cmd is None:
+            return None
+
+        return cmd, end
+
+    def suggest(self, word: str, max_distance: int = 2, limit: int = 3) -> List[str]:
+        """Returns the names closest to the given word by edit distance."""
+
+        results = []
+        # Each pending node carries the last row of the Levenshtein distance matrix
+        # for its path, so shared prefixes are only computed once
+        pending = [("", self.root, list(range(len(word) + 1)))]
+
+        while pending:
+            name, node, row = pending.pop()
+
+            cmd = node.get(_TRIE_COMMAND)
+            if cmd is not None and name and row[-1] <= max_distance:
+                results.append((row[-1], name))
+
+            for char, child in node.items():
+                if char == _TRIE_COMMAND:
+                    continue
+
+                next_row = [row[0] + 1]
+                for i, word_char in enumerate(word, 1):
+                    next_row.append(
+                        min(
+                            next_row[i - 1] + 1,
+                            row[i] + 1,
+                            row[i - 1] + (word_char != char),
+                        )
+                    )
+
+                # Prune branches that can no longer come close enough
+                if min(next_row) <= max_distance:
+                    pending.append((name + char, child, next_row))
+
+        return [name for _, name in sorted(results)[:limit]]
+
+
+class Job:
+    """Command invocation running in the background."""
+
+    id: int
+    cmd: Command
+    ctx: "Context"
+    task: "asyncio.Task[None]"
+    start_time_us: int
+    progress: Optional[str]
+
+    def __init__(
+        self, job_id: int, cmd: Command, ctx: "Context", task: "asyncio.Task[None]"
+    ) -> None:
+        self.id = job_id
+        self.cmd = cmd
+        self.ctx = ctx
+        self.task = task
+        self.start_time_us = util.time.usec()
+        self.progress = None
+
+
+class StatusMessage:
+    """Live status response that coalesces rapid updates into as few edits as possible.
+
+    At most one edit is in flight at a time and only the latest text is sent, so edits
+    can't arrive out of order. Text identical to the last edit is skipped, and the
+    interval between edits backs off when Telegram reports flood waits.
+    """
+
+    ctx: "Context"
+    min_interval: float
+    interval: float
+    edits: int
+    skipped: int
+
+    def __init__(self, ctx: "Context", min_interval: float = STATUS_MIN_INTERVAL):
+        self.ctx = ctx
+        self.min_interval = min_interval
+        self.interval = min_interval
+        self.edits = 0
+        self.skipped = 0
+
+        self._text: Optional[str] = None
+        self._sent_text: Optional[str] = None
+        self._next_time = 0.0
+        self._sending = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def task(self) -> Optional[asyncio.Task]:
+        return self._task
+
+    def update(self, text: str) -> None:
+        """Sets the status text, which is sent in the background as soon as allowed."""
+
+        self._text = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._send_updates())
+
+    async def _send_updates(self) -> None:
+        loop = asyncio.get_event_loop()
+
+        while self._text is not None:
+            delay = self._next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            text, self._text = self._text, None
+            if text is None:
+                break
+            if text == self._sent_text:
+                self.skipped += 1
+                continue
+
+            self._sending = True
+            try:
+                await self.ctx.respond(text, overflow="truncate", reuse_response=True)
+            except tg.errors.MessageNotModifiedError:
+                self.skipped += 1
+            except tg.errors.FloodWaitError as e:
+                # Slow down and retry with the latest text once the wait is over
+                self.interval = min(self.interval * 2, STATUS_MAX_INTERVAL)
+                if self._text is None:
+                    self._text = text
+
+                self._next_time = loop.time() + max(e.seconds, self.interval)
+                continue
+            except Exception as e:
+                self.ctx.bot.log.warning("Error updating status message", exc_info=e)
+            else:
+                self.edits += 1
+                # Recover from earlier flood waits gradually
+                self.interval = max(self.interval / 2, self.min_interval)
+            finally:
+                self._sending = False
+
+            self._sent_text = text
+            self._next_time = loop.time() + self.interval
+
+    async def flush(self) -> None:
+        """Waits for the latest status text to be sent."""
+
+        if self._task is not None and not self._task.done():
+            await asyncio.wait((self._task,))
+
+    async def stop(self) -> None:
+        """Drops pending status updates and waits for the edit in flight to finish."""
+
+        self._text = None
+        if self._task is None or self._task.done():
+            return
+
+        if not self._sending:
+            self._task.cancel()
+
+        await asyncio.wait((self._task,))
+
+
 # Command invocation context
 class Context:
+    # Commands are invoked often, so avoid the overhead of a dict for each context
+    # Lazily resolved fields are left unset until they're first accessed
+    __slots__ = (
+        "bot",
+        "event",
+        "msg",
+        "cmd_len",
+        "invoker",
+        "response",
+        "response_mode",
+        "job",
+        "_status",
+        "start_time",
+        "first_response_time",
+        "input",
+        "plain_input",
+        "args",
+        "segments",
+    )
+
     bot: "Bot"
     event: tg.events.common.EventCommon
     msg: tg.custom.Message
-    segments: Sequence[str]
     cmd_len: int
     invoker: str
 
     response: Optional[tg.custom.Message]
     response_mode: Optional[str]
+    job: Optional[Job]
+    _status: Optional[StatusMessage]
+    start_time: float
+    first_response_time: Optional[float]
     input: str
     plain_input: str
     args: Sequence[str]
+    segments: Sequence[str]
 
     def __init__(
         self,
         bot: "Bot",
         event: tg.events.common.EventCommon,
         msg: tg.custom.Message,
-        segments: Sequence[str],
+        invoker: str,
         cmd_len: int,
     ) -> None:
         self.bot = bot
         self.event = event
         self.msg = msg
-        self.segments = segments
         self.cmd_len = cmd_len
-        self.invoker = segments[0]
+        self.invoker = invoker
 
         # Response message to be filled later
         self.response = None
         self.response_mode = None
+        # Background job running the command, if any
+        self.job = None
+        # Live status message, created on first use
+        self._status = None
+        # Event loop times of the invocation and the first response, for metrics
+        self.start_time = bot.loop.time()
+        self.first_response_time = None
         # Single argument string (unparsed, i.e. complete with Markdown formatting symbols)
         self.input = self.msg.text[self.cmd_len :]
         # Single argument string (parsed, i.e. plain text)
@@ -109,20 +565,51 @@ class Context:
     def __getattr__(self, name: str) -> Any:
         if name == "args":
             return self._get_args()
+        if name == "segments":
+            return self._get_segments()
 
         raise AttributeError(
             f"'{type(self).__name__}' object has no attribute '{name}'"
         )
 
-    # Argument segments
+    # Argument segments, split from the original message even if the input was
+    # replaced by a reply
     def _get_args(self) -> Sequence[str]:
-        self.args = self.segments[1:]
+        self.args = self.msg.raw_text[self.cmd_len :].split()
         return self.args
 
+    # Command name and argument segments
+    def _get_segments(self) -> Sequence[str]:
+        self.segments = [self.invoker, *self.args]
+        return self.segments
+
+    # Live status updates that are coalesced into as few edits as possible
+    @property
+    def status(self) -> StatusMessage:
+        if self._status is None:
+            self._status = StatusMessage(self)
+
+        return self._status
+
+    # Progress reporting for background jobs
+    def set_progress(self, progress: str) -> None:
+        if self.job is not None:
+            self.job.progress = progress
+
+    # Shared lookups on the invoking message
+    async def get_sender(self) -> Any:
+        return await util.tg.get_lookups(self.msg).get_sender()
+
+    async def get_chat(self) -> Any:
+        return await util.tg.get_lookups(self.msg).get_chat()
+
+    async def get_reply_message(self) -> Any:
+        return await util.tg.get_lookups(self.msg).get_reply_message()
+
     # Wrapper for Bot.respond()
     async def respond(
         self,
-        text: Optional[str] = None,
+        text: Union[str, AsyncIterable[str], None] = None,
         *,
         mode: Optional[str] = None,
         overflow: Optional[str] = None,
@@ -132,87 +619,114 @@ class Context:
         reuse_response: bool = False,
         **kwargs: Any,
     ) -> tg.custom.Message:
+        # Make sure that pending status updates can't overwrite this response
+        status = self._status
+        if status is not None and util.async_helpers.current_task() is not status.task:
+            await status.stop()
+
         if overflow is None:
             overflow = self.bot.config["bot"]["overflow_mode"]
 
-        # Handle splitting early because it requires persistent state
-        if text and overflow == "split":
-            return await self.respond_split(
+        if text is None or isinstance(text, str) and (overflow != "split" or not text):
+            self.response = await self.bot.respond(
+                msg or self.msg,
                 text,
                 mode=mode,
-                max_pages=max_pages,
                 redact=redact,
-                msg=msg,
-                reuse_response=reuse_response,
+                response=self.response
+                if reuse_response and mode == self.response_mode
+                else None,
                 **kwargs,
             )
+            self.response_mode = mode
+            if self.first_response_time is None:
+                self.first_response_time = self.bot.loop.time()
 
-        self.response = await self.bot.respond(
-            msg or self.msg,
+            return self.response
+
+        # Splitting is handled separately because it requires persistent state
+        # Streamed text can only be sent in pages
+        return await self.respond_split(
             text,
             mode=mode,
+            max_pages=max_pages,
             redact=redact,
-            response=self.response
-            if reuse_response and mode == self.response_mode
-            else None,
+            msg=msg,
+            reuse_response=reuse_response,
             **kwargs,
         )
-        self.response_mode = mode
-        return self.response
 
     async def respond_split(
         self,
-        text: str,
+        text: Union[str, AsyncIterable[str]],
         *,
         max_pages: Optional[int] = None,
         redact: Optional[bool] = None,
         **kwargs: Any,
-    ) -> tg.custom.Message:
+    ) -> Optional[tg.custom.Message]:
         if redact is None:
             redact = self.bot.config["bot"]["redact_responses"]
 
         if max_pages is None:
             max_pages = self.bot.config["bot"]["overflow_page_limit"]
 
-        if redact:
+        if redact and isinstance(text, str):
             # Redact before splitting in case the sensitive content is on a message boundary
             text = self.bot.redact_message(text)
+            redact = False
+
+        # Leave room for the ellipses or truncation suffix around each page
+        pages = util.tg.paginate(
+            text,
+            util.tg.MESSAGE_CHAR_LIMIT - len("...") - len(util.tg.TRUNCATION_SUFFIX),
+        )
 
         pages_sent = 0
         last_msg = None
-        while text and pages_sent < max_pages:
-            # Make sure that there's an ellipsis placed at both the beginning and end,
-            # depending on whether there's more content to be shown
-            # The conditions are a bit complex, so just use a primitive LUT for now
-            if len(text) <= 4096:
-                # Low remaining content might require no ellipses
-                if pages_sent == 0:
-                    page = text[: util.tg.MESSAGE_CHAR_LIMIT]
-                    ellipsis_chars = 0
-                else:
-                    page = "..." + text[: util.tg.MESSAGE_CHAR_LIMIT - 3]
-                    ellipsis_chars = 3
-            elif pages_sent == max_pages - 1:
-                # Last page should use the standard truncation path if it's too large
-                if pages_sent == 0:
-                    page = text
-                    ellipsis_chars = 0
-                else:
-                    page = "..." + text
-                    ellipsis_chars = 3
-            else:
-                # Remaining content in other pages might need two ellipses
-                if pages_sent == 0:
-                    page = text[: util.tg.MESSAGE_CHAR_LIMIT - 3] + "..."
-                    ellipsis_chars = 3
-                else:
-                    page = "..." + text[: util.tg.MESSAGE_CHAR_LIMIT - 6] + "..."
-                    ellipsis_chars = 6
-
-            last_msg = await self.respond_multi(page, **kwargs)
-            text = text[util.tg.MESSAGE_CHAR_LIMIT - ellipsis_chars :]
+        send_task: Optional["asyncio.Task[tg.custom.Message]"] = None
+
+        async def send(page: str, suffix: str) -> None:
+            nonlocal pages_sent, last_msg, send_task
+
+            if pages_sent > 0:
+                page = "..." + page
+
+            # Keep pages in order, but build the next page while this one is sent
+            if send_task is not None:
+                last_msg = await send_task
+
+            send_task = self.bot.loop.create_task(
+                self.respond_multi(
+                    page + suffix, overflow="truncate", redact=redact, **kwargs
+                )
+            )
             pages_sent += 1
 
+        try:
+            # Pages are sent one behind so that we know whether more content follows
+            prev_page = None
+            async for page in pages:
+                if prev_page is not None:
+                    if pages_sent == max_pages - 1:
+                        await send(prev_page, util.tg.TRUNCATION_SUFFIX)
+                        prev_page = None
+                        break
+
+                    await send(prev_page, "...")
+
+                prev_page = page
+
+            if prev_page is not None:
+                await send(prev_page, "")
+
+            if send_task is not None:
+                last_msg = await send_task
+                send_task = None
+        finally:
+            await pages.aclose()
+            if send_task is not None:
+                send_task.cancel()
+
         return last_msg
 
     async def respond_multi(
@@ -3,19 +3,24 @@ import logging
 from typing import Optional
 
 import aiohttp
-
 import telethon as tg
 
 from ..util.config import Config
 from .command_dispatcher import CommandDispatcher
 from .database_provider import DatabaseProvider
 from .event_dispatcher import EventDispatcher
+from .job_manager import JobManager
 from .module_extender import ModuleExtender
 from .telegram_bot import TelegramBot
 
 
 class Bot(
-    TelegramBot, ModuleExtender, CommandDispatcher, DatabaseProvider, EventDispatcher
+    TelegramBot,
+    ModuleExtender,
+    CommandDispatcher,
+    JobManager,
+    DatabaseProvider,
+    EventDispatcher,
 ):
     # Initialized during instantiation
     config: Config
@@ -60,8 +65,14 @@ class Bot(
         self.log.info("Stopping")
         if self.loaded:
             await self.dispatch_event("stop")
+        await self.stop_jobs()
+        self.flush_coalesced_events()
+        await self.dispatch_engine.stop(timeout=5)
+        if self.recorder is not None:
+            self.recorder.close()
         await self.http.close()
         await self._db.close()
+        self.db_executor.shutdown()
 
         self.log.info("Running post-stop hooks")
         if self.loaded:
@@ -1,4 +1,5 @@
-from typing import TYPE_CHECKING, Any, MutableMapping
+import asyncio
+from typing import TYPE_CHECKING, Any, MutableMapping, Optional, Sequence, Union
 
 import telethon as tg
 
@@ -8,14 +9,25 @@ from .bot_mixin_base import MixinBase
 if TYPE_CHECKING:
     from .bot import Bot
 
+# Maximum number of responses to keep for cacheable commands
+COMMAND_CACHE_SIZE = 256
+
 
 class CommandDispatcher(MixinBase):
     # Initialized during instantiation
     commands: MutableMapping[str, command.Command]
+    command_trie: command.CommandTrie
+    command_limiters: MutableMapping[str, command.CommandLimiter]
+    command_cache: util.cache.LRUCache
+    command_metrics: util.metrics.MetricsRegistry
 
     def __init__(self: "Bot", **kwargs: Any) -> None:
         # Initialize command map
         self.commands = {}
+        self.command_trie = command.CommandTrie(self.commands)
+        self.command_limiters = {}
+        self.command_cache = util.cache.LRUCache(COMMAND_CACHE_SIZE)
+        self.command_metrics = util.metrics.MetricsRegistry()
 
         # Propagate initialization to other mixins
         super().__init__(**kwargs)
@@ -38,6 +50,11 @@ class CommandDispatcher(MixinBase):
 
             self.commands[alias] = cmd
 
+        if cmd.limit is not None and cmd.limit_group not in self.command_limiters:
+            self.command_limiters[cmd.limit_group] = command.CommandLimiter(cmd.limit)
+
+        self._commands_changed()
+
     def unregister_command(self: "Bot", cmd: command.Command) -> None:
         del self.commands[cmd.name]
 
@@ -47,6 +64,19 @@ class CommandDispatcher(MixinBase):
             except KeyError:
                 continue
 
+        # Drop the limiter once no commands in its group are left
+        if cmd.limit_group in self.command_limiters and not any(
+            other.limit_group == cmd.limit_group for other in self.commands.values()
+        ):
+            del self.command_limiters[cmd.limit_group]
+
+        self._commands_changed()
+
+    def _commands_changed(self: "Bot") -> None:
+        self.command_trie = command.CommandTrie(self.commands)
+        # Cached responses can depend on the registered commands, e.g. for help
+        self.command_cache.clear()
+
     def register_commands(self: "Bot", mod: module.Module) -> None:
         for name, func in util.misc.find_prefixed_funcs(mod, "cmd_"):
             done = False
@@ -75,14 +105,100 @@ class CommandDispatcher(MixinBase):
             self.unregister_command(cmd)
 
     def command_predicate(self: "Bot", event: tg.events.NewMessage.Event) -> bool:
-        if event.raw_text.startswith(self.prefix):
-            parts = event.raw_text.split()
-            parts[0] = parts[0][len(self.prefix) :]
+        text = event.raw_text
+        if not text.startswith(self.prefix):
+            return False
+
+        # Only the command name is scanned here; arguments are split on demand
+        match = self.command_trie.match(text, len(self.prefix))
+        if match is None:
+            return False
+
+        cmd, end = match
+        event.command_match = cmd, text[len(self.prefix) : end]
+        return True
+
+    async def _invoke_cached(
+        self: "Bot", cmd: command.Command, ctx: command.Context
+    ) -> Optional[Union[str, Sequence[str]]]:
+        key = (cmd.name, ctx.input)
+        ret = self.command_cache.get(key)
+        if ret is util.cache.MISSING:
+            ret = await cmd.func(ctx)
+            if ret is not None:
+                if not isinstance(ret, str):
+                    ret = tuple(ret)
+
+                self.command_cache.put(key, ret, cmd.cache_ttl)
+
+        return ret
+
+    async def _invoke_command(
+        self: "Bot", cmd: command.Command, ctx: command.Context
+    ) -> None:
+        # Wait for our turn if the command is limited
+        limiter = self.command_limiters.get(cmd.limit_group)
+        if limiter is not None:
+            if limiter.full:
+                self.command_metrics.record_rejection(cmd.name)
+                await ctx.respond(
+                    f"⚠️ Too many `{cmd.name}` commands are already running or queued. Try again later."
+                )
+                return
 
-            event.segments = parts
-            return True
+            await limiter.acquire(
+                lambda position: ctx.respond(f"⏳ Queued, position {position}")
+            )
 
-        return False
+        # Invoke command function
+        error = False
+        cancelled = False
+        try:
+            if cmd.cache_ttl is not None:
+                ret = await self._invoke_cached(cmd, ctx)
+            else:
+                ret = await cmd.func(ctx)
+
+            # Response shortcut
+            if isinstance(ret, str):
+                await ctx.respond(ret)
+            elif ret is not None:
+                # Send each page of multi-page responses in order
+                for page in ret:
+                    await ctx.respond_multi(page)
+        except tg.errors.MessageNotModifiedError:
+            cmd.module.log.warning(
+                f"Command '{cmd.name}' triggered a message edit with no changes; make sure there is only a single bot instance running"
+            )
+        except asyncio.CancelledError:
+            # Cancellation is a regular exception before Python 3.8, so make sure it
+            # reaches the job manager instead of being reported as an error
+            cancelled = True
+            raise
+        except Exception as e:
+            error = True
+            cmd.module.log.error(f"Error in command '{cmd.name}'", exc_info=e)
+            await ctx.respond(
+                f"⚠️ Error executing command:\n```{util.error.format_exception(e)}```"
+            )
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+            if cancelled:
+                self.command_metrics.record_cancellation(cmd.name)
+            else:
+                # Times include waiting in the queue because that's what users see
+                end_time = self.loop.time()
+                response_time = None
+                if ctx.first_response_time is not None:
+                    response_time = ctx.first_response_time - ctx.start_time
+
+                self.command_metrics.record(
+                    cmd.name, end_time - ctx.start_time, response_time, error
+                )
+
+        await self.dispatch_event("command", cmd, ctx.event)
 
     async def on_command(self: "Bot", msg: tg.events.NewMessage.Event) -> None:
         cmd = None
@@ -92,19 +208,10 @@ class CommandDispatcher(MixinBase):
             return
 
         try:
-            # Attempt to get command info
-            try:
-                cmd = self.commands[msg.segments[0]]
-            except KeyError:
-                return
-
             # Construct invocation context
+            cmd, invoker = msg.command_match
             ctx = command.Context(
-                self,
-                msg,
-                msg.message,
-                msg.segments,
-                len(self.prefix) + len(msg.segments[0]) + 1,
+                self, msg, msg.message, invoker, len(self.prefix) + len(invoker) + 1
             )
 
             # Ensure specified argument needs are met
@@ -113,7 +220,7 @@ class CommandDispatcher(MixinBase):
 
                 if cmd.usage_reply:
                     if msg.is_reply:
-                        reply_msg = await msg.get_reply_message()
+                        reply_msg = await ctx.get_reply_message()
                         if reply_msg.text:
                             ctx.input = reply_msg.text
                             ctx.plain_input = reply_msg.raw_text
@@ -129,24 +236,12 @@ class CommandDispatcher(MixinBase):
                     await ctx.respond(err_base)
                     return
 
-            # Invoke command function
-            try:
-                ret = await cmd.func(ctx)
-
-                # Response shortcut
-                if ret is not None:
-                    await ctx.respond(ret)
-            except tg.errors.MessageNotModifiedError:
-                cmd.module.log.warning(
-                    f"Command '{cmd.name}' triggered a message edit with no changes; make sure there is only a single bot instance running"
-                )
-            except Exception as e:
-                cmd.module.log.error(f"Error in command '{cmd.name}'", exc_info=e)
-                await ctx.respond(
-                    f"⚠️ Error executing command:\n```{util.error.format_exception(e)}```"
-                )
-
-            await self.dispatch_event("command", cmd, msg)
+            if cmd.background:
+                self.start_job(cmd, ctx)
+            else:
+                await self._invoke_command(cmd, ctx)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             if cmd is not None:
                 cmd.module.log.error("Error in command handler", exc_info=e)
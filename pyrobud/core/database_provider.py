@@ -13,6 +13,7 @@ class DatabaseProvider(MixinBase):
     # Initialized during instantiation
     _db: util.db.AsyncDB
     db: util.db.AsyncDB
+    db_executor: util.db.DBExecutor
 
     def __init__(self: "Bot", **kwargs: Any) -> None:
         # Initialize database
@@ -37,8 +38,30 @@ class DatabaseProvider(MixinBase):
         super().__init__(**kwargs)
 
     def _init_db(self: "Bot", db_path: str):
-        self._db = util.db.AsyncDB(
-            plyvel.DB(db_path, create_if_missing=True, paranoid_checks=True)
+        db = plyvel.DB(db_path, create_if_missing=True, paranoid_checks=True)
+
+        # Run all database operations on a dedicated thread
+        self.db_executor = util.db.DBExecutor()
+
+        # Share a single write batcher between all prefixed databases
+        db_config = self.config["database"]
+        batcher = None
+        if db_config["group_commit"]:
+            batcher = util.db.WriteBatcher(
+                db,
+                db_config["commit_window"],
+                db_config["max_batch_size"],
+                sync=db_config["sync"],
+                executor=self.db_executor,
+            )
+
+        # Share a single read cache as well to keep it coherent
+        cache = util.db.ReadCache(db_config["cache_size"], db_config["cache_sizes"])
+
+        self._db = util.db.AsyncDB(db, batcher, cache, executor=self.db_executor)
+        # Counters are read and written through the root database with full keys
+        self._db.counters = util.db.CounterBuffer(
+            self._db, db_config["counter_flush_interval"]
         )
 
     def get_db(self: "Bot", prefix: str) -> util.db.AsyncDB:
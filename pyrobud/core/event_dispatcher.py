@@ -1,22 +1,117 @@
 import asyncio
 import bisect
-from typing import TYPE_CHECKING, Any, MutableMapping, MutableSequence
+import collections
+import functools
+import itertools
+import operator
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Counter,
+    Dict,
+    Hashable,
+    Mapping,
+    MutableMapping,
+    MutableSequence,
+    Optional,
+    Sequence,
+)
+
+import telethon as tg
 
 from .. import module, util
-from ..listener import Listener, ListenerFunc
+from ..listener import (
+    Listener,
+    ListenerFilter,
+    ListenerFunc,
+    ListenerIndex,
+    StopPropagation,
+)
 from .bot_mixin_base import MixinBase
 
 if TYPE_CHECKING:
     from .bot import Bot
 
+# Relative importance of queued events, used to decide what to shed under load
+# Lower values are more important, similar to listener priorities
+EVENT_PRIORITIES = {
+    "message": 0,
+    "chat_action": 0,
+    "message_delete": 1,
+    "message_edit": 1,
+    "stat_event": 1,
+    "message_read": 2,
+    "user_update": 2,
+}
+DEFAULT_EVENT_PRIORITY = 1
+
+# Bot lifecycle events are exempt from default timeouts because their listeners
+# are expected to do slow setup and teardown work
+LIFECYCLE_EVENTS = {"load", "start", "started", "stop", "stopped"}
+
+# Seconds that listeners get to clean up after being cancelled for timing out
+LISTENER_CANCEL_GRACE = 1
+
+
+def _message_read_key(event: tg.events.MessageRead.Event) -> Optional[Hashable]:
+    # Contents reads carry their own message IDs and no peer, so they never supersede
+    # each other like the max ID in regular read receipts does
+    if event.contents:
+        return None
+
+    return event.chat_id, event.outbox
+
+
+# Keys identifying the state that each coalescable event updates
+# Updates with the same key supersede each other, and None opts out of coalescing
+COALESCE_KEYS: Mapping[str, Callable[[Any], Optional[Hashable]]] = {
+    "message_edit": operator.attrgetter("chat_id", "id"),
+    "message_read": _message_read_key,
+    "user_update": operator.attrgetter("chat_id", "user_id"),
+}
+
 
 class EventDispatcher(MixinBase):
     # Initialized during instantiation
     listeners: MutableMapping[str, MutableSequence[Listener]]
+    listener_index: MutableMapping[str, ListenerIndex]
+    dispatch_engine: util.dispatch.DispatchEngine
+    staged_listeners: bool
+    listener_timeout: float
+    event_timeout: float
+    listener_timeouts: Counter[str]
+    coalescers: MutableMapping[str, util.dispatch.Coalescer]
 
     def __init__(self: "Bot", **kwargs: Any) -> None:
         # Initialize listener map
         self.listeners = {}
+        self.listener_index = {}
+
+        # Initialize bounded dispatch engine for queued events
+        dispatch_config = self.config["dispatch"]
+        self.dispatch_engine = util.dispatch.DispatchEngine(
+            max_concurrency=dispatch_config["max_concurrency"],
+            max_event_concurrency=dispatch_config["max_event_concurrency"],
+            queue_size=dispatch_config["queue_size"],
+            overflow_policy=dispatch_config["overflow_policy"],
+            shards=dispatch_config["shards"],
+        )
+        self.staged_listeners = dispatch_config["staged_listeners"]
+        self.listener_timeout = dispatch_config["listener_timeout"]
+        self.event_timeout = dispatch_config["event_timeout"]
+        self.listener_timeouts = collections.Counter()
+
+        # Initialize coalescers for events that are enabled in the config
+        self.coalescers = {}
+        for event, window in dispatch_config["coalesce"].items():
+            if event not in COALESCE_KEYS:
+                raise ValueError(f"Event '{event}' can't be coalesced")
+
+            if window > 0:
+                self.coalescers[event] = util.dispatch.Coalescer(
+                    window, functools.partial(self._flush_coalesced, event)
+                )
 
         # Propagate initialization to other mixins
         super().__init__(**kwargs)
@@ -27,14 +122,17 @@ class EventDispatcher(MixinBase):
         event: str,
         func: ListenerFunc,
         priority: int = 100,
+        filt: Optional[ListenerFilter] = None,
+        timeout: Optional[float] = None,
     ) -> None:
-        listener = Listener(event, func, mod, priority)
+        listener = Listener(event, func, mod, priority, filt, timeout)
 
         if event in self.listeners:
             bisect.insort(self.listeners[event], listener)
         else:
             self.listeners[event] = [listener]
 
+        self.listener_index[event] = ListenerIndex(self.listeners[event])
         self.update_module_events()
 
     def unregister_listener(self: "Bot", listener: Listener) -> None:
@@ -42,15 +140,38 @@ class EventDispatcher(MixinBase):
         # Remove list if empty
         if not self.listeners[listener.event]:
             del self.listeners[listener.event]
+            del self.listener_index[listener.event]
+        else:
+            self.listener_index[listener.event] = ListenerIndex(
+                self.listeners[listener.event]
+            )
 
         self.update_module_events()
 
+    def _get_listener_timeout(
+        self: "Bot", event: str, func: ListenerFunc
+    ) -> Optional[float]:
+        timeout = getattr(func, "_listener_timeout", None)
+        if timeout is None:
+            if event in LIFECYCLE_EVENTS:
+                return None
+
+            timeout = self.listener_timeout
+
+        # Zero disables the timeout
+        return timeout or None
+
     def register_listeners(self: "Bot", mod: module.Module) -> None:
         for event, func in util.misc.find_prefixed_funcs(mod, "on_"):
             done = True
             try:
                 self.register_listener(
-                    mod, event, func, priority=getattr(func, "_listener_priority", 100)
+                    mod,
+                    event,
+                    func,
+                    priority=getattr(func, "_listener_priority", 100),
+                    filt=getattr(func, "_listener_filter", None),
+                    timeout=self._get_listener_timeout(event, func),
                 )
                 done = True
             finally:
@@ -70,26 +191,253 @@ class EventDispatcher(MixinBase):
         for listener in to_unreg:
             self.unregister_listener(listener)
 
-    async def dispatch_event(
-        self: "Bot", event: str, *args: Any, wait: bool = True, **kwargs: Any
+    def _listener_deadline(
+        self: "Bot", lst: Listener, deadline: Optional[float]
+    ) -> Optional[float]:
+        if lst.timeout is None:
+            return deadline
+
+        lst_deadline = self.loop.time() + lst.timeout
+        return lst_deadline if deadline is None else min(deadline, lst_deadline)
+
+    def _listener_timed_out(
+        self: "Bot", event: str, lst: Listener, elapsed: float
     ) -> None:
-        tasks = set()
+        self.listener_timeouts[lst.module.name] += 1
+        lst.module.log.warning(
+            f"'{event}' event listener timed out after {elapsed:.1f} seconds and was cancelled"
+        )
+
+    @staticmethod
+    def _listener_finished(event: str, lst: Listener, task: asyncio.Task) -> None:
+        # Called for listeners that kept running past the cleanup grace period
+        if task.cancelled():
+            return
+
+        exp = task.exception()
+        if exp is not None and not isinstance(exp, StopPropagation):
+            lst.module.log.error(f"Error in '{event}' event listener", exc_info=exp)
+
+    async def _run_stage(
+        self: "Bot",
+        event: str,
+        listeners: Sequence[Listener],
+        args: Sequence[Any],
+        kwargs: Mapping[str, Any],
+        deadline: Optional[float],
+    ) -> bool:
+        start = self.loop.time()
+
+        # Avoid the overhead of a task for the common single-listener case
+        if len(listeners) == 1:
+            lst = listeners[0]
+            lst_deadline = self._listener_deadline(lst, deadline)
+            watchdog = None
 
+            try:
+                if lst_deadline is None:
+                    await lst.func(*args, **kwargs)
+                else:
+                    with util.async_helpers.Deadline(lst_deadline) as watchdog:
+                        await lst.func(*args, **kwargs)
+            except StopPropagation:
+                return True
+            except asyncio.CancelledError:
+                # Cancellation is a regular exception before Python 3.8, so make sure
+                # it reaches the caller instead of being logged as a listener error
+                raise
+            except Exception as e:
+                if watchdog is not None and watchdog.expired:
+                    self._listener_timed_out(event, lst, self.loop.time() - start)
+                else:
+                    lst.module.log.error(
+                        f"Error in '{event}' event listener", exc_info=e
+                    )
+
+            return False
+
+        tasks = {
+            self.loop.create_task(lst.func(*args, **kwargs)): lst for lst in listeners
+        }
+        deadlines: Dict[asyncio.Task, float] = {}
+        for task, lst in tasks.items():
+            task_deadline = self._listener_deadline(lst, deadline)
+            if task_deadline is not None:
+                deadlines[task] = task_deadline
+
+        pending = set(tasks)
+        timed_out = {}
         try:
-            listeners = self.listeners[event]
+            while pending:
+                next_deadline = min(
+                    (deadlines[task] for task in pending if task in deadlines),
+                    default=None,
+                )
+                timeout = (
+                    max(0, next_deadline - self.loop.time())
+                    if next_deadline is not None
+                    else None
+                )
+                _, pending = await asyncio.wait(pending, timeout=timeout)
+
+                # Cancel listeners that are past their deadlines
+                now = self.loop.time()
+                for task in list(pending):
+                    task_deadline = deadlines.get(task)
+                    if task_deadline is not None and task_deadline <= now:
+                        task.cancel()
+                        pending.remove(task)
+                        timed_out[task] = now - start
+
+            # Let cancelled listeners clean up so that we can check how they ended
+            if timed_out:
+                _, unfinished = await asyncio.wait(
+                    set(timed_out), timeout=LISTENER_CANCEL_GRACE
+                )
+                for task in unfinished:
+                    task.add_done_callback(
+                        functools.partial(self._listener_finished, event, tasks[task])
+                    )
+        except asyncio.CancelledError:
+            # Don't leave listeners running after the event itself is cancelled
+            for task in tasks:
+                task.cancel()
+
+            raise
+
+        stop = False
+        for task, lst in tasks.items():
+            if task in timed_out:
+                self._listener_timed_out(event, lst, timed_out[task])
+                if not task.done() or task.cancelled():
+                    continue
+
+            exp = task.exception()
+            if isinstance(exp, StopPropagation):
+                stop = True
+            elif exp is not None:
+                lst.module.log.error(f"Error in '{event}' event listener", exc_info=exp)
+
+        return stop
+
+    async def _run_listeners(
+        self: "Bot",
+        event: str,
+        listeners: Sequence[Listener],
+        args: Sequence[Any],
+        kwargs: Mapping[str, Any],
+    ) -> None:
+        deadline = None
+        if self.event_timeout and event not in LIFECYCLE_EVENTS:
+            deadline = self.loop.time() + self.event_timeout
+
+        if not self.staged_listeners:
+            await self._run_stage(event, listeners, args, kwargs, deadline)
+            return
+
+        # Listeners are kept sorted, so each run of equal priorities forms a stage
+        # Stages run in order and any listener can stop the ones after its stage
+        for _, stage in itertools.groupby(listeners, operator.attrgetter("priority")):
+            if deadline is not None and self.loop.time() >= deadline:
+                self.log.warning(
+                    f"Event '{event}' timed out before reaching all of its listeners"
+                )
+                break
+
+            if await self._run_stage(event, list(stage), args, kwargs, deadline):
+                self.log.debug("Propagation of event '%s' stopped", event)
+                break
+
+    def _match_listeners(
+        self: "Bot", event: str, args: Sequence[Any]
+    ) -> Sequence[Listener]:
+        try:
+            index = self.listener_index[event]
         except KeyError:
-            return None
+            return ()
+
+        # Filters are matched against the first argument, which is the Telegram
+        # event for all events that can be filtered
+        data = args[0] if args else None
+        listeners = index.match(data)
+
+        # Let all listeners share entity lookups on the event
+        if listeners and isinstance(data, tg.events.common.EventCommon):
+            util.tg.get_lookups(data)
 
+        return listeners
+
+    def _make_job(
+        self: "Bot", event: str, args: Sequence[Any], kwargs: Mapping[str, Any]
+    ) -> Optional[util.dispatch.DispatchJob]:
+        # Don't queue anything if no listener is interested in the event
+        listeners = self._match_listeners(event, args)
         if not listeners:
+            return None
+
+        # Keep events from the same chat in order when sharding is enabled
+        key = getattr(args[0], "chat_id", None) if args else None
+
+        return util.dispatch.DispatchJob(
+            event,
+            EVENT_PRIORITIES.get(event, DEFAULT_EVENT_PRIORITY),
+            self._run_listeners,
+            event,
+            listeners,
+            args,
+            kwargs,
+            key=key,
+        )
+
+    async def dispatch_event(
+        self: "Bot", event: str, *args: Any, wait: bool = True, **kwargs: Any
+    ) -> None:
+        if not wait:
+            # Fire-and-forget events go through the bounded dispatch engine
+            job = self._make_job(event, args, kwargs)
+            if job is not None:
+                self.log.debug("Queueing event '%s' with data %s", event, args)
+                self.dispatch_engine.put_nowait(job)
+
             return
 
-        for lst in listeners:
-            task = self.loop.create_task(lst.func(*args, **kwargs))
-            tasks.add(task)
+        listeners = self._match_listeners(event, args)
+        if not listeners:
+            return
 
         self.log.debug("Dispatching event '%s' with data %s", event, args)
-        if wait:
-            await asyncio.wait(tasks)
+        await self._run_listeners(event, listeners, args, kwargs)
+
+    async def queue_event(self: "Bot", event: str, *args: Any, **kwargs: Any) -> None:
+        """Queues the given event for dispatch, waiting for space if necessary."""
+
+        coalescer = self.coalescers.get(event)
+        if coalescer is not None and args:
+            key = COALESCE_KEYS[event](args[0])
+            if key is not None:
+                # Don't hold on to events that no listeners are interested in
+                if self._match_listeners(event, args):
+                    coalescer.submit(key, (args, kwargs))
+
+                return
+
+        job = self._make_job(event, args, kwargs)
+        if job is not None:
+            self.log.debug("Queueing event '%s' with data %s", event, args)
+            await self.dispatch_engine.put(job)
+
+    def _flush_coalesced(self: "Bot", event: str, item: Any) -> None:
+        args, kwargs = item
+
+        # This runs in a timer callback, so it can't wait for space in the queue
+        job = self._make_job(event, args, kwargs)
+        if job is not None:
+            self.log.debug("Queueing coalesced event '%s' with data %s", event, args)
+            self.dispatch_engine.put_nowait(job)
+
+    def flush_coalesced_events(self: "Bot") -> None:
+        for coalescer in self.coalescers.values():
+            coalescer.flush_all()
 
     async def log_stat(self: "Bot", stat: str) -> None:
         await self.dispatch_event("stat_event", stat, wait=False)
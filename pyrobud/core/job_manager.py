@@ -0,0 +1,73 @@
+import asyncio
+import itertools
+from typing import TYPE_CHECKING, Any, Iterator, MutableMapping, Optional
+
+from .. import command, module, util
+from .bot_mixin_base import MixinBase
+
+if TYPE_CHECKING:
+    from .bot import Bot
+
+
+class JobManager(MixinBase):
+    # Initialized during instantiation
+    jobs: MutableMapping[int, command.Job]
+    _job_ids: Iterator[int]
+
+    def __init__(self: "Bot", **kwargs: Any) -> None:
+        # Initialize job map
+        self.jobs = {}
+        self._job_ids = itertools.count(1)
+
+        # Propagate initialization to other mixins
+        super().__init__(**kwargs)
+
+    def start_job(
+        self: "Bot", cmd: command.Command, ctx: command.Context
+    ) -> command.Job:
+        job_id = next(self._job_ids)
+        task = self.loop.create_task(self._run_job(job_id, cmd, ctx))
+
+        job = command.Job(job_id, cmd, ctx, task)
+        ctx.job = job
+        self.jobs[job_id] = job
+        task.add_done_callback(lambda _: self.jobs.pop(job_id, None))
+
+        return job
+
+    async def _run_job(
+        self: "Bot", job_id: int, cmd: command.Command, ctx: command.Context
+    ) -> None:
+        try:
+            await self._invoke_command(cmd, ctx)
+        except asyncio.CancelledError:
+            cmd.module.log.info(f"Job {job_id} for command '{cmd.name}' was cancelled")
+
+            # Don't touch the response if the job was cancelled to stop the bot
+            if not self.stopping:
+                await ctx.respond(f"⛔ Job `{job_id}` (`{cmd.name}`) was cancelled.")
+        except Exception as e:
+            cmd.module.log.error("Error in command job", exc_info=e)
+
+            await ctx.respond(
+                f"⚠️ Error in command job:\n```{util.error.format_exception(e)}```"
+            )
+
+    def cancel_job(self: "Bot", job_id: int) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+
+        return job.task.cancel()
+
+    def cancel_jobs(self: "Bot", mod: Optional[module.Module] = None) -> None:
+        for job in list(self.jobs.values()):
+            if mod is None or job.cmd.module == mod:
+                job.task.cancel()
+
+    async def stop_jobs(self: "Bot") -> None:
+        tasks = [job.task for job in self.jobs.values()]
+        self.cancel_jobs()
+
+        if tasks:
+            await asyncio.wait(tasks)
@@ -42,6 +42,7 @@ class ModuleExtender(MixinBase):
 
         self.unregister_listeners(mod)
         self.unregister_commands(mod)
+        self.cancel_jobs(mod)
         del self.modules[cls.name]
 
     def _load_all_from_metamod(
@@ -1,11 +1,11 @@
 from typing import (
     TYPE_CHECKING,
     Any,
-    Callable,
-    Coroutine,
+    List,
     Mapping,
     MutableMapping,
     Optional,
+    Sequence,
     Tuple,
     Type,
     Union,
@@ -22,14 +22,95 @@ if TYPE_CHECKING:
 
 TelegramConfig = Mapping[str, Union[int, str]]
 EventType: Any = tg.events.common.EventBuilder
-TgEventHandler = Callable[[EventType], Coroutine[Any, Any, None]]
+EventRoute = Tuple[str, Type[EventType]]
+# Rendered text, parse mode, and link preview flag of a response
+ResponseContent = Tuple[str, Any, bool]
+
+# Maximum number of response messages to remember the last sent content of
+RESPONSE_CACHE_SIZE = 1024
+# Only edits that change nothing but these options can be compared with the last
+# sent content, so edits with any other options are always sent
+RESPONSE_CONTENT_KWARGS = {"link_preview", "parse_mode"}
+EDIT_UPDATE_TYPES = (tg.types.UpdateEditMessage, tg.types.UpdateEditChannelMessage)
+
+
+def _update_types(*names: str) -> Sequence[Type[tg.tl.TLObject]]:
+    # Not all update types exist in every version of Telethon
+    return [getattr(tg.types, name) for name in names if hasattr(tg.types, name)]
+
+
+# Event builders for each event and the raw update types that they can build from
+# Commands are routed first so that they're handled before other listeners
+EVENT_BUILDERS: Mapping[str, Tuple[Type[EventType], Sequence[Type[tg.tl.TLObject]]]] = {
+    "command": (
+        tg.events.NewMessage,
+        _update_types(
+            "UpdateNewMessage",
+            "UpdateNewChannelMessage",
+            "UpdateShortMessage",
+            "UpdateShortChatMessage",
+        ),
+    ),
+    "message": (
+        tg.events.NewMessage,
+        _update_types(
+            "UpdateNewMessage",
+            "UpdateNewChannelMessage",
+            "UpdateShortMessage",
+            "UpdateShortChatMessage",
+        ),
+    ),
+    "message_edit": (
+        tg.events.MessageEdited,
+        _update_types("UpdateEditMessage", "UpdateEditChannelMessage"),
+    ),
+    "message_delete": (
+        tg.events.MessageDeleted,
+        _update_types("UpdateDeleteMessages", "UpdateDeleteChannelMessages"),
+    ),
+    "message_read": (
+        tg.events.MessageRead,
+        _update_types(
+            "UpdateReadHistoryInbox",
+            "UpdateReadHistoryOutbox",
+            "UpdateReadChannelInbox",
+            "UpdateReadChannelOutbox",
+            "UpdateReadMessagesContents",
+            "UpdateChannelReadMessagesContents",
+        ),
+    ),
+    "chat_action": (
+        tg.events.ChatAction,
+        _update_types(
+            "UpdateNewMessage",
+            "UpdateNewChannelMessage",
+            "UpdateChatParticipantAdd",
+            "UpdateChatParticipantDelete",
+            "UpdateChannelParticipant",
+            "UpdatePinnedMessages",
+            "UpdatePinnedChannelMessages",
+        ),
+    ),
+    "user_update": (
+        tg.events.UserUpdate,
+        _update_types(
+            "UpdateUserStatus",
+            "UpdateUserTyping",
+            "UpdateChatUserTyping",
+            "UpdateChannelUserTyping",
+        ),
+    ),
+}
 
 
 class TelegramBot(MixinBase):
     # Initialized during instantiation
     tg_config: TelegramConfig
-    _mevent_handlers: MutableMapping[str, Tuple[TgEventHandler, EventType]]
+    _update_routes: MutableMapping[Type[tg.tl.TLObject], List[EventRoute]]
     loaded: bool
+    recorder: Optional[util.replay.UpdateRecorder]
+    response_contents: util.cache.LRUCache
+    skipped_edits: int
 
     # Initialized during startup
     client: tg.TelegramClient
@@ -40,9 +121,16 @@ class TelegramBot(MixinBase):
 
     def __init__(self: "Bot", **kwargs: Any) -> None:
         self.tg_config = self.config["telegram"]
-        self._mevent_handlers = {}
+        self._update_routes = {}
         self.loaded = False
 
+        record_path = self.config["bot"]["record_path"]
+        self.recorder = util.replay.UpdateRecorder(record_path) if record_path else None
+
+        # Last sent content of each response message, used to skip no-op edits
+        self.response_contents = util.cache.LRUCache(RESPONSE_CACHE_SIZE)
+        self.skipped_edits = 0
+
         # Propagate initialization to other mixins
         super().__init__(**kwargs)
 
@@ -61,9 +149,26 @@ class TelegramBot(MixinBase):
             raise TypeError("API hash must be a string")
 
         # Initialize Telegram client with gathered parameters
-        self.client = tg.TelegramClient(
-            session_name, api_id, api_hash, connection_retries=10, retry_delay=5
-        )
+        outbound_config = self.config["outbound"]
+        if outbound_config["enabled"]:
+            scheduler = util.outbound.OutboundScheduler(
+                outbound_config["rates"],
+                outbound_config["chat_rate"],
+                outbound_config["chat_burst"],
+                outbound_config["max_flood_wait"],
+            )
+            self.client = util.outbound.ScheduledTelegramClient(
+                session_name,
+                api_id,
+                api_hash,
+                connection_retries=10,
+                retry_delay=5,
+                scheduler=scheduler,
+            )
+        else:
+            self.client = tg.TelegramClient(
+                session_name, api_id, api_hash, connection_retries=10, retry_delay=5
+            )
 
     async def start(self: "Bot") -> None:
         self.log.info("Starting")
@@ -72,11 +177,10 @@ class TelegramBot(MixinBase):
         # Load prefix
         self.prefix = await self.db.get("prefix", self.config["bot"]["default_prefix"])
 
-        # Register core command handler
-        self.client.add_event_handler(
-            self.on_command,
-            tg.events.NewMessage(outgoing=True, func=self.command_predicate),
-        )
+        # Route all updates through a single handler to avoid building and
+        # filtering them separately for each event type
+        self.update_module_events()
+        self.client.add_event_handler(self.on_raw_update, tg.events.Raw())
 
         # Load modules
         self.load_all_modules()
@@ -100,6 +204,10 @@ class TelegramBot(MixinBase):
         # noinspection PyTypeChecker
         self.uid = user.id
 
+        # Start recording updates now that the user is known
+        if self.recorder is not None:
+            self.recorder.start(self.user)
+
         # Set Sentry username if enabled
         if self.config["bot"]["report_username"]:
             with sentry_sdk.configure_scope() as scope:
@@ -134,35 +242,63 @@ class TelegramBot(MixinBase):
             # Make sure we stop when done
             await self.stop()
 
-    def update_module_event(
-        self: "Bot", name: str, event_type: Type[EventType]
-    ) -> None:
-        if name in self.listeners:
-            # Add if there ARE listeners and it's NOT already registered
-            if name not in self._mevent_handlers:
+    async def on_raw_update(self: "Bot", update: tg.tl.TLObject) -> None:
+        if self.recorder is not None:
+            self.recorder.record(update)
+
+        if isinstance(update, EDIT_UPDATE_TYPES):
+            self._forget_changed_response(update.message)
 
-                async def event_handler(event: EventType) -> None:
-                    await self.dispatch_event(name, event)
+        routes = self._update_routes.get(type(update))
+        if not routes:
+            return
 
-                handler_info = (event_handler, event_type())
-                self.client.add_event_handler(*handler_info)
-                self._mevent_handlers[name] = handler_info
-        elif name in self._mevent_handlers:
-            # Remove if there are NO listeners and it's ALREADY registered
-            self.client.remove_event_handler(*self._mevent_handlers[name])
-            del self._mevent_handlers[name]
+        # Each event type is only built once, even if several routes use it
+        built: MutableMapping[Type[EventType], Any] = {}
+        for name, builder in routes:
+            try:
+                event = built[builder]
+            except KeyError:
+                event = built[builder] = self._build_event(builder, update)
+
+            if not event:
+                continue
+
+            if name == "command":
+                if event.out and self.command_predicate(event):
+                    await self.on_command(event)
+            else:
+                await self.queue_event(name, event)
+
+    def _build_event(
+        self: "Bot", builder: Type[EventType], update: tg.tl.TLObject
+    ) -> Optional[tg.events.common.EventCommon]:
+        # Mirror the client's own event building
+        event = builder.build(update, None, getattr(self, "uid", None))
+        if event:
+            event.original_update = update
+            event._entities = getattr(update, "_entities", {})
+            event._set_client(self.client)
+
+        return event
 
     def update_module_events(self: "Bot") -> None:
-        self.update_module_event("message", tg.events.NewMessage)
-        self.update_module_event("message_edit", tg.events.MessageEdited)
-        self.update_module_event("message_delete", tg.events.MessageDeleted)
-        self.update_module_event("message_read", tg.events.MessageRead)
-        self.update_module_event("chat_action", tg.events.ChatAction)
-        self.update_module_event("user_update", tg.events.UserUpdate)
+        """Updates the routing of raw updates to events that have listeners."""
+
+        routes: MutableMapping[Type[tg.tl.TLObject], List[EventRoute]] = {}
+        for name, (builder, update_types) in EVENT_BUILDERS.items():
+            # Commands are always needed, but other events need listeners
+            if name != "command" and name not in self.listeners:
+                continue
+
+            for update_type in update_types:
+                routes.setdefault(update_type, []).append((name, builder))
+
+        self._update_routes = routes
 
     @property
     def events_activated(self: "Bot") -> int:
-        return len(self._mevent_handlers)
+        return sum(1 for name in EVENT_BUILDERS if name in self.listeners)
 
     def redact_message(self, text: str) -> str:
         tg_config: Mapping[str, str] = self.config["telegram"]
@@ -178,6 +314,49 @@ class TelegramBot(MixinBase):
 
         return text
 
+    def _remember_response(
+        self: "Bot",
+        response: Optional[tg.custom.Message],
+        content: Optional[ResponseContent],
+    ) -> None:
+        if response is None:
+            return
+
+        key = (response.chat_id, response.id)
+        if content is None:
+            self.response_contents.pop(key)
+        else:
+            # Keep the plain text to detect edits made elsewhere
+            self.response_contents.put(key, (content, response.raw_text))
+
+    def _forget_changed_response(self: "Bot", msg: tg.types.TypeMessage) -> None:
+        if not isinstance(msg, tg.types.Message):
+            return
+
+        # Responses edited by the user or another client no longer have the content
+        # that we last sent, so the next edit can't be skipped
+        key = (tg.utils.get_peer_id(msg.peer_id), msg.id)
+        entry = self.response_contents.get(key, count=False)
+        if entry is not util.cache.MISSING and entry[1] != msg.message:
+            self.response_contents.pop(key)
+
+    async def _edit_response(
+        self: "Bot",
+        msg: tg.custom.Message,
+        text: Optional[str],
+        content: Optional[ResponseContent],
+        **kwargs: Any,
+    ) -> tg.custom.Message:
+        if content is not None:
+            entry = self.response_contents.get((msg.chat_id, msg.id))
+            if entry is not util.cache.MISSING and entry[0] == content:
+                self.skipped_edits += 1
+                return msg
+
+        response = await msg.edit(text=text, **kwargs)
+        self._remember_response(response, content)
+        return response
+
     # Flexible response function with filtering, truncation, redaction, etc.
     async def respond(
         self: "Bot",
@@ -210,24 +389,35 @@ class TelegramBot(MixinBase):
         if mode is None:
             mode = self.config["bot"]["response_mode"]
 
+        content = None
+        if text is not None and kwargs.keys() <= RESPONSE_CONTENT_KWARGS:
+            content = (
+                text,
+                kwargs.get("parse_mode", util.cache.MISSING),
+                kwargs["link_preview"],
+            )
+
         if mode == "edit":
-            return await msg.edit(text=text, **kwargs)
+            return await self._edit_response(msg, text, content, **kwargs)
 
         if mode == "reply":
             if response is not None:
                 # Already replied, so just edit the existing reply to reduce spam
-                return await response.edit(text=text, **kwargs)
+                return await self._edit_response(response, text, content, **kwargs)
 
             # Reply since we haven't done so yet
-            return await msg.reply(text, **kwargs)
+            response = await msg.reply(text, **kwargs)
+            self._remember_response(response, content)
+            return response
 
         if mode == "repost":
             if response is not None:
                 # Already reposted, so just edit the existing reply to reduce spam
-                return await response.edit(text=text, **kwargs)
+                return await self._edit_response(response, text, content, **kwargs)
 
             # Repost since we haven't done so yet
             response = await msg.respond(text, reply_to=msg.reply_to_msg_id, **kwargs)
+            self._remember_response(response, content)
             await msg.delete()
             return response
 
@@ -1,8 +1,43 @@
-from typing import Any, Callable
+import collections
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 ListenerFunc = Any
 Decorator = Callable[[ListenerFunc], ListenerFunc]
 
+# Message attributes that can be used as media filters
+MEDIA_TYPES = (
+    "audio",
+    "contact",
+    "dice",
+    "document",
+    "game",
+    "geo",
+    "gif",
+    "invoice",
+    "photo",
+    "poll",
+    "sticker",
+    "venue",
+    "video",
+    "video_note",
+    "voice",
+    "web_preview",
+)
+
+
+class StopPropagation(Exception):
+    """Raised by listeners to stop lower-priority listeners from handling events."""
+
 
 def priority(_prio: int) -> Decorator:
     """Sets priority on the given listener function."""
@@ -14,17 +49,184 @@ def priority(_prio: int) -> Decorator:
     return prio_decorator
 
 
+def timeout(seconds: float) -> Decorator:
+    """Sets the time limit of the given listener function, or 0 for no limit."""
+
+    def timeout_decorator(func: ListenerFunc) -> ListenerFunc:
+        setattr(func, "_listener_timeout", seconds)
+        return func
+
+    return timeout_decorator
+
+
+def where(
+    *,
+    outgoing: bool = False,
+    incoming: bool = False,
+    chats: Optional[Iterable[int]] = None,
+    senders: Optional[Iterable[int]] = None,
+    media: Optional[Iterable[str]] = None,
+) -> Decorator:
+    """Restricts the given listener function to events matching all given criteria."""
+
+    filt = ListenerFilter(
+        outgoing=outgoing, incoming=incoming, chats=chats, senders=senders, media=media
+    )
+
+    def where_decorator(func: ListenerFunc) -> ListenerFunc:
+        setattr(func, "_listener_filter", filt)
+        return func
+
+    return where_decorator
+
+
+class ListenerFilter:
+    out: Optional[bool]
+    chats: Optional[FrozenSet[int]]
+    senders: Optional[FrozenSet[int]]
+    media: Optional[Tuple[str, ...]]
+
+    def __init__(
+        self,
+        *,
+        outgoing: bool = False,
+        incoming: bool = False,
+        chats: Optional[Iterable[int]] = None,
+        senders: Optional[Iterable[int]] = None,
+        media: Optional[Iterable[str]] = None,
+    ) -> None:
+        if outgoing and incoming:
+            raise ValueError("Listener can't be restricted to both directions")
+
+        self.out = True if outgoing else False if incoming else None
+        self.chats = frozenset(chats) if chats is not None else None
+        self.senders = frozenset(senders) if senders is not None else None
+
+        if media is not None:
+            media = tuple(media)
+            for media_type in media:
+                if media_type not in MEDIA_TYPES:
+                    raise ValueError(f"Unknown media type '{media_type}'")
+
+        self.media = media
+
+    def matches(self, event: Any) -> bool:
+        if self.out is not None and getattr(event, "out", None) != self.out:
+            return False
+
+        if self.chats is not None and getattr(event, "chat_id", None) not in self.chats:
+            return False
+
+        if (
+            self.senders is not None
+            and getattr(event, "sender_id", None) not in self.senders
+        ):
+            return False
+
+        if self.media is not None and not any(
+            getattr(event, media_type, None) for media_type in self.media
+        ):
+            return False
+
+        return True
+
+
 class Listener:
+    __slots__ = ("event", "func", "module", "priority", "event_filter", "timeout")
+
     event: str
     func: ListenerFunc
     module: Any
     priority: int
+    event_filter: Optional[ListenerFilter]
+    timeout: Optional[float]
 
-    def __init__(self, event: str, func: ListenerFunc, mod: Any, prio: int) -> None:
+    def __init__(
+        self,
+        event: str,
+        func: ListenerFunc,
+        mod: Any,
+        prio: int,
+        filt: Optional[ListenerFilter] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
         self.event = event
         self.func = func
         self.module = mod
         self.priority = prio
+        self.event_filter = filt
+        self.timeout = timeout
 
     def __lt__(self, other: "Listener") -> bool:
         return self.priority < other.priority
+
+
+# Position of a listener in a ListenerIndex's sorted list along with its filter
+_FilteredListener = Tuple[int, ListenerFilter]
+
+
+class ListenerIndex:
+    """Index of an event's listeners by filter criteria for quick matching.
+
+    Listeners filtered by chat or sender are only looked up by the event's chat and
+    sender IDs, so the cost of matching doesn't grow with the number of them.
+    """
+
+    listeners: Sequence[Listener]
+    filtered: bool
+    unfiltered: List[Listener]
+    by_chat: DefaultDict[int, List[_FilteredListener]]
+    by_sender: DefaultDict[int, List[_FilteredListener]]
+    scanned: List[_FilteredListener]
+
+    def __init__(self, listeners: Sequence[Listener]) -> None:
+        self.listeners = listeners
+        self.unfiltered = []
+        self.by_chat = collections.defaultdict(list)
+        self.by_sender = collections.defaultdict(list)
+        self.scanned = []
+
+        self._unfiltered_positions: List[int] = []
+        for pos, lst in enumerate(listeners):
+            filt = lst.event_filter
+            if filt is None:
+                self.unfiltered.append(lst)
+                self._unfiltered_positions.append(pos)
+            elif filt.chats is not None:
+                for chat_id in filt.chats:
+                    self.by_chat[chat_id].append((pos, filt))
+            elif filt.senders is not None:
+                for sender_id in filt.senders:
+                    self.by_sender[sender_id].append((pos, filt))
+            else:
+                self.scanned.append((pos, filt))
+
+        self.filtered = len(self.unfiltered) != len(listeners)
+
+    def match(self, event: Any) -> Sequence[Listener]:
+        """Returns the listeners interested in the given event in priority order."""
+
+        # Fast path: nothing to filter
+        if not self.filtered:
+            return self.listeners
+
+        candidates: List[_FilteredListener] = []
+        chat_id = getattr(event, "chat_id", None)
+        if chat_id is not None and chat_id in self.by_chat:
+            candidates.extend(self.by_chat[chat_id])
+
+        sender_id = getattr(event, "sender_id", None)
+        if sender_id is not None and sender_id in self.by_sender:
+            candidates.extend(self.by_sender[sender_id])
+
+        candidates.extend(self.scanned)
+        # Index lookups only cover one criterion, so check the rest of them here
+        matched = [pos for pos, filt in candidates if filt.matches(event)]
+        if not matched:
+            return self.unfiltered
+
+        # Listeners are sorted, so their positions keep registration order within
+        # each priority
+        matched.extend(self._unfiltered_positions)
+        matched.sort()
+        return [self.listeners[pos] for pos in matched]
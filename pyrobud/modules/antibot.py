@@ -5,7 +5,7 @@ from typing import ClassVar, Union
 import regex
 import telethon as tg
 
-from .. import command, module, util
+from .. import command, listener, module, util
 
 MessageEvent = Union[tg.events.NewMessage.Event, tg.events.ChatAction.Event]
 
@@ -168,7 +168,7 @@ class AntibotModule(module.Module):
             if forwarded:
                 # Messages forwarded from a linked channel by Telegram don't have a sender
                 # We can assume these messages are safe since only admins can link channels
-                sender = await msg.get_sender()
+                sender = await util.tg.get_lookups(msg).get_sender()
                 if sender is None:
                     return 0
 
@@ -197,8 +197,8 @@ class AntibotModule(module.Module):
             return False
 
         # Load message metadata entities
-        chat = await msg.get_chat()
-        sender = await msg.get_sender()
+        chat = await util.tg.get_lookups(msg).get_chat()
+        sender = await util.tg.get_lookups(msg).get_sender()
 
         # Messages forwarded from a linked channel by Telegram don't have a sender
         # We can assume these messages are safe because only admins can link channels
@@ -260,7 +260,7 @@ class AntibotModule(module.Module):
         await asyncio.sleep(1)
 
         # Delete all of the sender's messages
-        chat = await event.get_chat()
+        chat = await util.tg.get_lookups(event).get_chat()
         request = tg.tl.functions.channels.DeleteUserHistoryRequest(chat, user)
         await self.bot.client(request)
 
@@ -280,26 +280,42 @@ class AntibotModule(module.Module):
             and await self.group_db.get(f"{event.chat_id}.enabled", False)
         )
 
+    # Run before other listeners so that spam doesn't reach them
+    @listener.priority(50)
+    @listener.where(incoming=True)
     async def on_message(self, msg: tg.events.NewMessage.Event) -> None:
         # Only run in groups where antibot is enabled
         if await self.is_enabled(msg):
             if await self.msg_is_suspicious(msg.message):
                 # This is most likely a spambot, take action against the user
-                user = await msg.get_sender()
+                user = await util.tg.get_lookups(msg).get_sender()
                 await self.take_action(msg, user)
+
+                # Don't waste any more work on a message that has been deleted
+                raise listener.StopPropagation
             else:
                 await self.user_db.put(
                     f"{msg.sender_id}.has_spoken_in_{msg.chat_id}", True
                 )
 
     async def clear_group(self, group_id: int) -> None:
-        async for key, _ in self.group_db.iterator(prefix=f"{group_id}."):
-            await self.group_db.delete(key)
+        # Iterators can't see queued writes
+        await self.db.flush()
+
+        prefix = f"{group_id}."
+        async with self.group_db.iterator(prefix=prefix, include_value=False) as it:
+            group_keys = [key async for key in it]
 
-        async for key, _ in self.user_db:
-            if key.endswith(f".has_spoken_in_{group_id}"):
-                await self.user_db.delete(key)
+        suffix = f".has_spoken_in_{group_id}"
+        async with self.user_db.iterator(include_value=False) as it:
+            user_keys = [key async for key in it if key.endswith(suffix)]
+
+        await asyncio.gather(
+            *(self.group_db.delete(key) for key in group_keys),
+            *(self.user_db.delete(key) for key in user_keys),
+        )
 
+    @listener.priority(50)
     async def on_chat_action(self, action: tg.events.ChatAction.Event) -> None:
         # Remove has-spoken-in flag for departing users
         if (action.user_left or action.user_kicked) and await self.is_enabled(action):
@@ -327,6 +343,7 @@ class AntibotModule(module.Module):
         if await self.user_is_suspicious(user):
             # This is most likely a spambot, take action against the user
             await self.take_action(action, user)
+            raise listener.StopPropagation
 
     @command.desc("Toggle the antibot auto-moderation feature in this group")
     async def cmd_antibot(self, ctx: command.Context) -> str:
@@ -348,7 +365,7 @@ class AntibotModule(module.Module):
 
         if state:
             # Check for required permissions
-            chat = await ctx.msg.get_chat()
+            chat = await ctx.get_chat()
             ch_participant = await self.bot.client(
                 tg.tl.functions.channels.GetParticipantRequest(chat, self.bot.user)
             )
@@ -194,14 +194,15 @@ Commands issued:
 
 {status_body}"""
 
-                # Wait for the rate-limit, the bot's response, and the send
+                # Update the status in the background while waiting for both the
+                # rate-limit and the bot's response
+                ctx.status.update(status)
                 try:
                     reply_task = self.bot.loop.create_task(reply_and_ack())
-                    send_task = self.bot.loop.create_task(ctx.respond(status))
 
                     # pylint: disable=unused-variable
                     done, pending = await asyncio.wait(
-                        (reply_task, send_task, asyncio.sleep(0.25))
+                        (reply_task, asyncio.sleep(0.25))
                     )
 
                     # Raise all exceptions
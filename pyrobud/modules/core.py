@@ -1,6 +1,6 @@
 import platform
 from collections import defaultdict
-from typing import ClassVar, MutableMapping
+from typing import ClassVar, List, MutableMapping, Union
 
 from .. import __version__, command, module, util
 
@@ -30,7 +30,8 @@ issues, questions, suggestions, or anything else related to this bot:
 
     @command.desc("List the commands")
     @command.usage("[filter: command or module name?]", optional=True)
-    async def cmd_help(self, ctx: command.Context):
+    @command.cacheable(ttl=0)
+    async def cmd_help(self, ctx: command.Context) -> Union[str, List[str]]:
         filt = ctx.input
         modules: MutableMapping[str, MutableMapping[str, str]] = defaultdict(dict)
 
@@ -60,6 +61,10 @@ Module: {cmd.module.name}
 Aliases: {aliases}
 Expected parameters: {args_desc}"""
 
+            suggestions = self.bot.command_trie.suggest(filt)
+            if suggestions:
+                return f"__That filter didn't match any commands or modules. Did you mean__ `{'`, `'.join(suggestions)}`__?__"
+
             return "__That filter didn't match any commands or modules.__"
 
         # Show full help
@@ -82,12 +87,13 @@ Expected parameters: {args_desc}"""
             mod_name = type(cmd.module).name
             modules[mod_name][cmd.name] = desc + aliases
 
+        pages: List[str] = []
         response = None
         for mod_name, commands in sorted(modules.items()):
             section = util.text.join_map(commands, heading=mod_name)
             add_len = len(section) + 2
             if response and (len(response) + add_len > util.tg.MESSAGE_CHAR_LIMIT):
-                await ctx.respond_multi(response)
+                pages.append(response)
                 response = None
 
             if response:
@@ -96,13 +102,45 @@ Expected parameters: {args_desc}"""
                 response = section
 
         if response:
-            await ctx.respond_multi(response)
+            pages.append(response)
+
+        return pages
 
     @command.desc("Get how long this bot has been up for")
     async def cmd_uptime(self, ctx: command.Context) -> str:
         delta_us = util.time.usec() - self.bot.start_time_us
         return f"Uptime: {util.time.format_duration_us(delta_us)}"
 
+    @command.desc("List running background jobs")
+    async def cmd_jobs(self, ctx: command.Context) -> str:
+        if not self.bot.jobs:
+            return "__No jobs are running.__"
+
+        now = util.time.usec()
+        lines = []
+        for job_id, job in sorted(self.bot.jobs.items()):
+            elapsed = util.time.format_duration_us(now - job.start_time_us)
+            line = f"`{job_id}`: `{job.cmd.name}` for {elapsed}"
+            if job.progress:
+                line += f" — {job.progress}"
+
+            lines.append(line)
+
+        return util.text.join_list(("**Jobs:**", *lines))
+
+    @command.desc("Cancel a running background job")
+    @command.usage("[job ID]")
+    async def cmd_cancel(self, ctx: command.Context) -> str:
+        try:
+            job_id = int(ctx.input)
+        except ValueError:
+            return "__Invalid job ID.__"
+
+        if not self.bot.cancel_job(job_id):
+            return f"__Job__ `{job_id}` __isn't running.__"
+
+        return f"Cancelling job `{job_id}`..."
+
     @command.desc("Get or change this bot prefix")
     @command.alias("setprefix", "getprefix")
     @command.usage("[new prefix?]", optional=True)
@@ -117,6 +117,7 @@ Time: {el_str}"""
 
     @command.desc("Get the code of a command")
     @command.usage("[command name]")
+    @command.cacheable(ttl=0)
     async def cmd_src(self, ctx: command.Context) -> str:
         cmd_name = ctx.input
 
@@ -134,7 +135,7 @@ Time: {el_str}"""
         if not ctx.msg.is_reply:
             return "__Reply to a message to get the text of.__"
 
-        reply_msg = await ctx.msg.get_reply_message()
+        reply_msg = await ctx.get_reply_message()
         await ctx.respond(reply_msg.text, parse_mode=None)
         return None
 
@@ -149,7 +150,7 @@ Time: {el_str}"""
         if not ctx.msg.is_reply:
             return "__Reply to a message to get its data.__"
 
-        reply_msg = await ctx.msg.get_reply_message()
+        reply_msg = await ctx.get_reply_message()
         data = util.tg.pretty_print_entity(reply_msg)
 
         return f"```{data}```"
@@ -164,7 +165,7 @@ Time: {el_str}"""
         entity_ref: tg.hints.EntitiesLike = ctx.input
 
         if ctx.input == "chat":
-            entity = await ctx.msg.get_chat()
+            entity = await ctx.get_chat()
         elif ctx.input:
             if ctx.input.isdigit():
                 try:
@@ -179,13 +180,145 @@ Time: {el_str}"""
             except ValueError as e:
                 return f"Error getting entity `{entity_ref}`: {e}"
         elif ctx.msg.is_reply:
-            entity = await ctx.msg.get_reply_message()
+            entity = await ctx.get_reply_message()
         else:
             return "__No entity given via argument or reply.__"
 
         pretty_printed = util.tg.pretty_print_entity(entity)
         return f"```{pretty_printed}```"
 
+    @command.desc("Show event dispatch queue statistics")
+    @command.alias("dinfo", "dstats")
+    async def cmd_dispatchinfo(self, ctx: command.Context) -> str:
+        engine = self.bot.dispatch_engine
+
+        if engine.shed:
+            shed = ", ".join(
+                f"{event}: {count}" for event, count in engine.shed.most_common()
+            )
+            shed_desc = f"{engine.total_shed} ({shed})"
+        else:
+            shed_desc = "0"
+
+        if self.bot.listener_timeouts:
+            timeouts = ", ".join(
+                f"{mod}: {count}"
+                for mod, count in self.bot.listener_timeouts.most_common()
+            )
+        else:
+            timeouts = "none"
+
+        coalescers = self.bot.coalescers
+        if coalescers:
+            coalesced = ", ".join(
+                f"{event}: {coalescer.coalesced}"
+                for event, coalescer in coalescers.items()
+            )
+        else:
+            coalesced = "disabled"
+
+        scheduler = getattr(self.bot.client, "scheduler", None)
+        if scheduler is not None:
+            flood_waits = ", ".join(
+                f"{family}: {count}"
+                for family, count in scheduler.flood_waits.most_common()
+            )
+            delayed = f"{scheduler.delayed} delayed in total"
+            outbound = {
+                "Outbound queue": f"{scheduler.queued} ({delayed})",
+                "Flood waits": flood_waits or "none",
+            }
+        else:
+            outbound = {}
+
+        if engine.shards:
+            mode = f"{engine.shards} ordered shards"
+            depths = ", ".join(map(str, engine.queue_depths))
+            shards = {"Shard queue depths": depths}
+        else:
+            mode = "worker pool"
+            shards = {}
+
+        queue_depth = f"{engine.queue_depth}/{engine.queue_size}"
+        return util.text.join_map(
+            {
+                "Mode": mode,
+                "Overflow policy": engine.overflow_policy,
+                "Queue depth": f"{queue_depth} (peak {engine.peak_queue_depth})",
+                "In flight": f"{engine.total_in_flight}/{engine.max_concurrency}",
+                "Processed": engine.processed,
+                "Shed": shed_desc,
+                "Listener timeouts": timeouts,
+                "Coalesced": coalesced,
+                "Skipped edits": self.bot.skipped_edits,
+                **shards,
+                **outbound,
+            },
+            heading="Event dispatch",
+        )
+
+    @command.desc("Show database cache and write batching statistics")
+    @command.alias("dbinfo")
+    async def cmd_dbstats(self, ctx: command.Context) -> str:
+        db = self.bot.db
+        sections = []
+
+        if db.cache is not None and db.cache.partitions:
+            partitions = {}
+            for name, partition in sorted(db.cache.partitions.items()):
+                lookups = partition.hits + partition.misses
+                hit_rate = partition.hits / lookups * 100 if lookups else 0
+                partitions[name or "(root)"] = " • ".join(
+                    (
+                        f"{len(partition)}/{partition.max_size} cached",
+                        f"{partition.hits} hits",
+                        f"{partition.misses} misses ({hit_rate:.1f}% hit rate)",
+                    )
+                )
+
+            sections.append(util.text.join_map(partitions, heading="Read cache"))
+        else:
+            sections.append("__Read cache is disabled or unused.__")
+
+        batcher = db.batcher
+        if batcher is not None:
+            per_batch = batcher.writes / batcher.batches if batcher.batches else 0
+            sections.append(
+                util.text.join_map(
+                    {
+                        "Writes": batcher.writes,
+                        "Batches": f"{batcher.batches} ({per_batch:.1f} writes each)",
+                        "Queued": batcher.queued,
+                    },
+                    heading="Group commits",
+                )
+            )
+        else:
+            sections.append("__Group commits are disabled.__")
+
+        executor = db.executor
+        if executor is not None:
+            completed = executor.completed
+            wakeups = executor.wakeups
+            per_wakeup = completed / wakeups if wakeups else 0
+            mean_wait_ms = executor.total_wait / completed * 1000 if completed else 0
+            queue_wait = f"{mean_wait_ms:.2f} ms mean"
+            queue_wait += f", {executor.max_wait * 1000:.2f} ms max"
+            sections.append(
+                util.text.join_map(
+                    {
+                        "Operations": completed,
+                        "Wakeups": f"{wakeups} ({per_wakeup:.1f} operations each)",
+                        "Queue depth": f"{executor.depth} (max {executor.max_depth})",
+                        "Queue wait": queue_wait,
+                        "Busy time": f"{executor.busy_time:.2f} s",
+                    },
+                    heading="Executor",
+                )
+            )
+
+        return "\n\n".join(sections)
+
     @command.desc("Get all contextually relevant IDs")
     @command.alias("user")
     async def cmd_id(self, ctx: command.Context) -> str:
@@ -197,8 +330,8 @@ Time: {el_str}"""
         lines.append(f"My user ID: `{self.bot.uid}`")
 
         if ctx.msg.is_reply:
-            reply_msg = await ctx.msg.get_reply_message()
-            sender = await reply_msg.get_sender()
+            reply_msg = await ctx.get_reply_message()
+            sender = await util.tg.get_lookups(reply_msg).get_sender()
             lines.append(f"Message ID: `{reply_msg.id}`")
 
             if sender:
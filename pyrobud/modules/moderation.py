@@ -1,4 +1,3 @@
-from datetime import datetime
 from typing import ClassVar, List, Optional
 
 import telethon as tg
@@ -9,14 +8,10 @@ from .. import command, module, util
 class ModerationModule(module.Module):
     name: ClassVar[str] = "Moderation"
 
-    @command.desc("Mention everyone in this group (**DO NOT ABUSE**)")
-    @command.usage("[comment?]", optional=True)
-    @command.alias("evo", "@everyone")
-    async def cmd_everyone(
+    async def mention_all(
         self,
         ctx: command.Context,
-        *,
-        tag: str = "\U000e0020everyone",
+        tag: str,
         user_filter: Optional[tg.types.TypeChannelParticipantsFilter] = None,
     ) -> Optional[str]:
         comment = ctx.input
@@ -30,7 +25,7 @@ class ModerationModule(module.Module):
 
         mention_slots = 4096 - len(mention_text)
 
-        chat = await ctx.msg.get_chat()
+        chat = await ctx.get_chat()
         async for user in self.bot.client.iter_participants(chat, filter=user_filter):
             mention_text += f"[\u200b](tg://user?id={user.id})"
 
@@ -41,12 +36,18 @@ class ModerationModule(module.Module):
         await ctx.respond(mention_text, mode="repost")
         return None
 
+    @command.desc("Mention everyone in this group (**DO NOT ABUSE**)")
+    @command.usage("[comment?]", optional=True)
+    @command.alias("evo", "@everyone")
+    async def cmd_everyone(self, ctx: command.Context) -> Optional[str]:
+        return await self.mention_all(ctx, "\U000e0020everyone")
+
     @command.desc("Mention all admins in a group (**DO NOT ABUSE**)")
     @command.usage("[comment?]", optional=True)
     @command.alias("adm", "@admin")
     async def cmd_admin(self, ctx: command.Context) -> Optional[str]:
-        return await self.cmd_everyone(
-            ctx, tag="admin", user_filter=tg.tl.types.ChannelParticipantsAdmins
+        return await self.mention_all(
+            ctx, "admin", user_filter=tg.tl.types.ChannelParticipantsAdmins
         )
 
     @command.desc("Ban user(s) from the current chat by ID or reply")
@@ -63,14 +64,14 @@ class ModerationModule(module.Module):
             return "__Encountered invalid ID while parsing arguments.__"
 
         if ctx.msg.is_reply:
-            reply_msg = await ctx.msg.get_reply_message()
+            reply_msg = await ctx.get_reply_message()
             user_ids.append(reply_msg.from_id)
 
         if not user_ids:
             return "__Provide a list of user IDs to ban, or reply to a user's message to ban them.__"
 
         lines: List[str]
-        chat = await ctx.msg.get_chat()
+        chat = await ctx.get_chat()
         single_user = len(user_ids) == 1
         if single_user:
             lines = []
@@ -113,6 +114,8 @@ class ModerationModule(module.Module):
     @command.desc("Prune deleted members in this group or the specified group")
     @command.alias("prune")
     @command.usage("[target chat ID/username/...?]", optional=True)
+    @command.limit(queue_size=2)
+    @command.background
     async def cmd_prunemembers(self, ctx: command.Context) -> str:
         if ctx.input:
             chat = await self.bot.client.get_entity(ctx.input)
@@ -122,14 +125,14 @@ class ModerationModule(module.Module):
             _chat_name = f" from **{chat.title}**"
             _chat_name2 = f" in **{chat.title}**"
         else:
-            chat = await ctx.msg.get_chat()
+            chat = await ctx.get_chat()
             _chat_name = ""
             _chat_name2 = ""
 
         await ctx.respond(f"Fetching members{_chat_name}...")
+        ctx.set_progress("Fetching members")
         all_members = await self.bot.client.get_participants(chat)
 
-        last_time = datetime.now()
         total_count = len(all_members)
         err_count = 0
         pruned_count = 0
@@ -143,21 +146,19 @@ class ModerationModule(module.Module):
                 continue
 
             try:
-                await self.bot.client.kick_participant(chat, user)
+                # Don't hold up interactive responses with bulk requests
+                with util.outbound.priority(util.outbound.PRIORITY_BULK):
+                    await self.bot.client.kick_participant(chat, user)
             except tg.errors.UserAdminInvalidError:
                 err_count += 1
             else:
                 pruned_count += 1
 
             percent_done = int((idx + 1) / total_count * 100)
-            now = datetime.now()
-            delta = now - last_time
-            if delta.total_seconds() >= 5:
-                await ctx.respond(
-                    f"{status_text} {percent_done}% done ({idx + 1} of {total_count} processed; {pruned_count} banned; {err_count} failed)"
-                )
-
-            last_time = now
+            progress = f"{percent_done}% done ({idx + 1} of {total_count} processed; {pruned_count} banned; {err_count} failed)"
+            ctx.set_progress(progress)
+            ctx.status.update(f"{status_text} {progress}")
+
             idx += 1
 
         percent_pruned = int(pruned_count / total_count * 100)
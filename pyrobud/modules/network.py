@@ -7,7 +7,7 @@ from typing import ClassVar, Optional
 import aiohttp
 import telethon as tg
 
-from .. import command, module, util
+from .. import command, listener, module, util
 
 LOGIN_CODE_REGEX = r"[Ll]ogin code: (\d+)"
 
@@ -23,11 +23,9 @@ class NetworkModule(module.Module):
 
         return f"Request response time: {after - before:.0f} ms"
 
+    # Only check Telegram service messages
+    @listener.where(senders={777000})
     async def on_message(self, msg: tg.events.NewMessage.Event) -> None:
-        # Only check Telegram service messages
-        if msg.sender_id != 777000:
-            return
-
         # Print login code if present
         match = re.search(LOGIN_CODE_REGEX, msg.raw_text)
         if match is not None:
@@ -35,6 +33,7 @@ class NetworkModule(module.Module):
 
     @command.desc("Upload given file to file.io")
     @command.usage("[expiry time?]", optional=True)
+    @command.background
     async def cmd_fileio(self, ctx: command.Context) -> str:
         expires = ctx.input
 
@@ -54,7 +53,7 @@ class NetworkModule(module.Module):
         else:
             expires = "2d"
 
-        reply_msg = await ctx.msg.get_reply_message()
+        reply_msg = await ctx.get_reply_message()
         if not reply_msg.file:
             return "__That message doesn't contain a file.__"
 
@@ -63,6 +62,7 @@ class NetworkModule(module.Module):
         buf.name = reply_msg.file.name
 
         await ctx.respond("Uploading file to [file.io](https://file.io/)...")
+        ctx.set_progress("Uploading to file.io")
 
         async with self.bot.http.post(
             f"https://file.io/?expires={expires}", data={"file": buf}
@@ -84,7 +84,7 @@ class NetworkModule(module.Module):
             return "__Provide or reply to a link to update it.__"
 
         if not link:
-            reply_msg = await ctx.msg.get_reply_message()
+            reply_msg = await ctx.get_reply_message()
 
             for entity, text in reply_msg.get_entities_text():
                 if isinstance(
@@ -123,6 +123,7 @@ class NetworkModule(module.Module):
 
     @command.desc("Generate a LMGTFY link (Let Me Google That For You)")
     @command.usage("[search query]")
+    @command.cacheable()
     async def cmd_lmgtfy(self, ctx: command.Context) -> str:
         query = ctx.input
         params = urllib.parse.urlencode({"q": query})
@@ -4,7 +4,7 @@ from typing import ClassVar, Match, Optional
 
 import telethon as tg
 
-from .. import command, module, util
+from .. import command, listener, module, util
 
 
 class SnippetsModule(module.Module):
@@ -25,12 +25,13 @@ class SnippetsModule(module.Module):
 
         return m.group(0)
 
+    @listener.where(outgoing=True)
     async def on_message(self, msg: tg.events.NewMessage.Event) -> None:
         # Don't process snippets from inline bots
         if msg.via_bot_id:
             return
 
-        if msg.out and msg.text:
+        if msg.text:
             orig_text = msg.text
 
             text = await util.run_sync(
@@ -48,7 +49,7 @@ class SnippetsModule(module.Module):
     async def cmd_snip(self, ctx: command.Context) -> str:
         content = None
         if ctx.msg.is_reply:
-            reply_msg = await ctx.msg.get_reply_message()
+            reply_msg = await ctx.get_reply_message()
             content = reply_msg.text
 
         if not content:
@@ -64,7 +65,7 @@ class SnippetsModule(module.Module):
     @command.desc("Show all snippets")
     @command.alias("sl", "snl", "spl", "snips", "snippets")
     async def cmd_sniplist(self, ctx: command.Context) -> str:
-        snippets = [f"**{key}**" async for key, _ in self.db]
+        snippets = [f"**{key}**" async for key in self.db.iterator(include_value=False)]
 
         if snippets:
             return util.text.join_list(("Snippet list:", *snippets))
@@ -1,4 +1,5 @@
-from typing import ClassVar, Optional
+import asyncio
+from typing import Any, ClassVar, Dict, Optional
 
 import telethon as tg
 
@@ -7,6 +8,9 @@ from .. import command, module, util
 USEC_PER_HOUR = 60 * 60 * 1000000
 USEC_PER_DAY = USEC_PER_HOUR * 24
 
+# Seconds between saves of command metrics, which are only kept in memory otherwise
+METRICS_SAVE_INTERVAL = 300
+
 
 def _calc_pct(num1: int, num2: int) -> str:
     if not num2:
@@ -25,13 +29,28 @@ def _calc_pd(stat: int, uptime: int) -> str:
     return "{:.1f}".format(stat / up_day).rstrip("0").rstrip(".")
 
 
+def _format_secs(secs: Optional[float]) -> str:
+    if secs is None:
+        return "n/a"
+    if secs < 1:
+        return f"{secs * 1000:.0f} ms"
+
+    return f"{secs:.1f} s"
+
+
 class StatsModule(module.Module):
     name: ClassVar[str] = "Stats"
     db: util.db.AsyncDB
+    metrics_task: Optional[asyncio.Task] = None
 
     async def on_load(self) -> None:
         self.db = self.bot.get_db("stats")
 
+        # Restore saved command metrics
+        saved_metrics: Optional[Dict[str, Any]] = await self.db.get("command_metrics")
+        if saved_metrics is not None:
+            self.bot.command_metrics.load(saved_metrics)
+
         # Log migration message if applicable
         if await self.db.has("stop_time_usec") or await self.db.has("uptime"):
             self.log.info("Migrating stats timekeeping format")
@@ -53,6 +72,31 @@ class StatsModule(module.Module):
         if not await self.db.has("start_time_usec"):
             await self.db.put("start_time_usec", time_us)
 
+        self.metrics_task = self.bot.loop.create_task(self.save_metrics_periodically())
+
+    async def on_stop(self) -> None:
+        # Make sure that a periodic save isn't running at the same time as the last one
+        if self.metrics_task is not None:
+            self.metrics_task.cancel()
+            await asyncio.wait([self.metrics_task])
+            self.metrics_task = None
+
+        await self.save_metrics()
+
+    async def save_metrics(self) -> None:
+        metrics = self.bot.command_metrics
+        if metrics.dirty:
+            await self.db.put("command_metrics", metrics.dump())
+
+    async def save_metrics_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(METRICS_SAVE_INTERVAL)
+
+            try:
+                await self.save_metrics()
+            except Exception as e:
+                self.log.error("Error saving command metrics", exc_info=e)
+
     async def on_message(self, msg: tg.events.NewMessage.Event) -> None:
         stat = "sent" if msg.out else "received"
         await self.bot.log_stat(stat)
@@ -81,9 +125,9 @@ class StatsModule(module.Module):
     @command.alias("stat")
     async def cmd_stats(self, ctx: command.Context) -> str:
         if ctx.input == "reset":
+            self.bot.command_metrics.clear()
             await self.db.clear()
-            await self.on_load()
-            await self.on_start(util.time.usec())
+            await self.db.put("start_time_usec", util.time.usec())
             return "__All stats have been reset.__"
 
         start_time: Optional[int] = await self.db.get("start_time_usec")
@@ -116,3 +160,63 @@ class StatsModule(module.Module):
             },
             heading="Stats since last reset",
         )
+
+    @command.desc(
+        "Show command usage, errors, and latency (pass `reset` to reset them)"
+    )
+    @command.usage('[command name or "reset"?]', optional=True)
+    async def cmd_cmdstats(self, ctx: command.Context) -> str:
+        registry = self.bot.command_metrics
+
+        if ctx.input == "reset":
+            registry.clear()
+            await self.save_metrics()
+            return "__Command stats have been reset.__"
+
+        if ctx.input:
+            # Resolve aliases to the names that metrics are recorded under
+            cmd = self.bot.commands.get(ctx.input)
+            name = cmd.name if cmd is not None else ctx.input
+
+            metrics = registry.commands.get(name)
+            if metrics is None:
+                return f"__No stats have been recorded for command__ `{name}`__.__"
+
+            error_pct = _calc_pct(metrics.errors, metrics.invocations)
+            percentiles = " • ".join(
+                f"p{pct} {_format_secs(metrics.percentile(pct))}"
+                for pct in (50, 90, 99)
+            )
+            return util.text.join_map(
+                {
+                    "Invocations": metrics.invocations,
+                    "Errors": f"{metrics.errors} ({error_pct}%)",
+                    "Rejected": metrics.rejected,
+                    "Cancelled": metrics.cancelled,
+                    "Mean time": _format_secs(metrics.mean_time),
+                    "Time percentiles": percentiles,
+                    "Max time": _format_secs(metrics.max_time),
+                    "Mean time to first response": _format_secs(
+                        metrics.mean_response_time
+                    ),
+                },
+                heading=f"Stats for command `{name}`",
+            )
+
+        if not registry.commands:
+            return "__No commands have been invoked yet.__"
+
+        by_invocations = sorted(
+            registry.commands.items(),
+            key=lambda item: item[1].invocations,
+            reverse=True,
+        )
+        summaries = {}
+        for name, metrics in by_invocations:
+            p50 = _format_secs(metrics.percentile(50))
+            p90 = _format_secs(metrics.percentile(90))
+            errors = f" • {metrics.errors} errors" if metrics.errors else ""
+            summary = f"{metrics.invocations} runs • p50 {p50} • p90 {p90}{errors}"
+            summaries[name] = summary
+
+        return util.text.join_map(summaries, heading="Command stats")
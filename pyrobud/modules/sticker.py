@@ -101,6 +101,7 @@ class StickerModule(module.Module):
     @command.desc("Copy a sticker into another pack")
     @command.alias("stickercopy", "scopy", "copys", "scp", "cps", "kang")
     @command.usage("[sticker pack short name? if not set] [emoji?]", optional=True)
+    @command.limit(group="sticker_bot")
     async def cmd_copysticker(self, ctx: command.Context) -> str:
         if not ctx.msg.is_reply:
             return "__Reply to a sticker to copy it.__"
@@ -123,7 +124,7 @@ class StickerModule(module.Module):
         else:
             await self.settings_db.put("kang_pack", pack_name)
 
-        reply_msg = await ctx.msg.get_reply_message()
+        reply_msg = await ctx.get_reply_message()
         if not reply_msg.sticker:
             return "__That message isn't a sticker.__"
 
@@ -155,7 +156,7 @@ class StickerModule(module.Module):
         if await self.db.has(name):
             return "__There's already a sticker with that name.__"
 
-        reply_msg = await ctx.msg.get_reply_message()
+        reply_msg = await ctx.get_reply_message()
         if not reply_msg.sticker:
             return "__That message isn't a sticker.__"
 
@@ -173,7 +174,7 @@ class StickerModule(module.Module):
         if await self.db.has(name):
             return "__There's already a sticker with that name.__"
 
-        reply_msg = await ctx.msg.get_reply_message()
+        reply_msg = await ctx.get_reply_message()
         if not reply_msg.sticker:
             return "__That message isn't a sticker.__"
 
@@ -264,11 +265,12 @@ class StickerModule(module.Module):
 
     @command.desc("Create a sticker from an image and add it to the given pack")
     @command.usage("[sticker pack name] [emoji to associate?]")
+    @command.limit(group="sticker_bot")
     async def cmd_sticker(self, ctx: command.Context) -> Optional[str]:
         if not (ctx.msg.is_reply or ctx.msg.file):
             return "__Reply to or embed an image to sticker it.__"
 
-        reply_msg = ctx.msg if ctx.msg.file else await ctx.msg.get_reply_message()
+        reply_msg = ctx.msg if ctx.msg.file else await ctx.get_reply_message()
         if not reply_msg.file:
             return "__That message doesn't contain an image.__"
 
@@ -311,7 +313,7 @@ class StickerModule(module.Module):
         if await self.db.has(name):
             return "__There's already a sticker with that name.__"
 
-        reply_msg = ctx.msg if ctx.msg.file else await ctx.msg.get_reply_message()
+        reply_msg = ctx.msg if ctx.msg.file else await ctx.get_reply_message()
         if not reply_msg.file:
             return "__That message isn't an image.__"
 
@@ -340,7 +342,7 @@ class StickerModule(module.Module):
             except ValueError:
                 return "__Invalid distorted block offset strength.__"
 
-        reply_msg = ctx.msg if ctx.msg.file else await ctx.msg.get_reply_message()
+        reply_msg = ctx.msg if ctx.msg.file else await ctx.get_reply_message()
         if not reply_msg.file:
             return "__That message isn't an image.__"
 
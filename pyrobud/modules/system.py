@@ -21,6 +21,7 @@ class SystemModule(module.Module):
     @command.desc("Run a snippet in a shell")
     @command.usage("[shell snippet]")
     @command.alias("sh")
+    @command.limit(max_concurrency=2, queue_size=5)
     async def cmd_shell(self, ctx: command.Context) -> str:
         snip = ctx.input
 
@@ -67,25 +68,30 @@ class SystemModule(module.Module):
 
     @command.desc("Test Internet speed")
     @command.alias("stest", "st")
+    @command.limit(queue_size=2, calls=2, period=300)
+    @command.background
     async def cmd_speedtest(self, ctx: command.Context) -> str:
         before = util.time.usec()
 
         st = await util.run_sync(speedtest.Speedtest)
         status = "Selecting server..."
 
-        await ctx.respond(status)
+        ctx.status.update(status)
+        ctx.set_progress("Selecting server")
         server = await util.run_sync(st.get_best_server)
         status += f" {server['sponsor']} ({server['name']})\n"
         status += f"Ping: {server['latency']:.2f} ms\n"
 
         status += "Performing download test..."
-        await ctx.respond(status)
+        ctx.status.update(status)
+        ctx.set_progress("Testing download speed")
         dl_bits = await util.run_sync(st.download)
         dl_mbit = dl_bits / 1000 / 1000
         status += f" {dl_mbit:.2f} Mbps\n"
 
         status += "Performing upload test..."
-        await ctx.respond(status)
+        ctx.status.update(status)
+        ctx.set_progress("Testing upload speed")
         ul_bits = await util.run_sync(st.upload)
         ul_mbit = ul_bits / 1000 / 1000
         status += f" {ul_mbit:.2f} Mbps\n"
@@ -162,6 +168,7 @@ class SystemModule(module.Module):
     @command.desc("Update this bot from Git and restart")
     @command.usage("[remote name?]", optional=True)
     @command.alias("up", "upd")
+    @command.background
     async def cmd_update(self, ctx: command.Context) -> Optional[str]:
         remote_name = ctx.input
 
@@ -191,6 +198,7 @@ class SystemModule(module.Module):
 
         # Pull from remote
         await ctx.respond(f"Pulling changes from `{remote}`...")
+        ctx.set_progress(f"Pulling changes from {remote}")
         await util.run_sync(remote.pull)
 
         # Return early if no changes were pulled
@@ -206,6 +214,7 @@ class SystemModule(module.Module):
                 pip = str(Path(prefix) / "bin" / "pip")
 
                 await ctx.respond("Updating dependencies...")
+                ctx.set_progress("Updating dependencies")
                 stdout, _, ret = await util.system.run_command(
                     pip, "install", repo.working_tree_dir
                 )
@@ -14,6 +14,7 @@ class TextModule(module.Module):
     @command.desc("Unicode character from hex codepoint")
     @command.usage("[hexadecimal Unicode codepoint]")
     @command.alias("cp", "chr", "uc", "c")
+    @command.cacheable()
     async def cmd_uni(self, ctx: command.Context) -> str:
         codepoint = ctx.input
         try:
@@ -43,6 +44,7 @@ class TextModule(module.Module):
     @command.desc("Apply strike-through formatting to the given text")
     @command.usage("[text to format]", reply=True)
     @command.alias("str", "strikethrough")
+    @command.cacheable()
     async def cmd_strike(self, ctx: command.Context) -> str:
         text = ctx.input
         return "\u0336".join(text) + "\u0336"
@@ -80,6 +82,7 @@ class TextModule(module.Module):
     @command.desc("Dissect a string into named Unicode codepoints")
     @command.usage("[text to dissect]", reply=True)
     @command.alias("cinfo", "chinfo", "ci")
+    @command.cacheable()
     async def cmd_charinfo(self, ctx: command.Context) -> str:
         text = ctx.input
 
@@ -109,6 +112,7 @@ class TextModule(module.Module):
 
     @command.desc("Replace the spaces in a string with clap emoji")
     @command.usage("[text to filter, or reply]", reply=True)
+    @command.cacheable()
     async def cmd_clap(self, ctx: command.Context) -> str:
         text = ctx.input
         return "\n".join("👏".join(line.split()) for line in text.split("\n"))
@@ -116,12 +120,14 @@ class TextModule(module.Module):
     @command.desc("Encode text into Base64")
     @command.alias("b64encode", "b64e")
     @command.usage("[text to encode, or reply]", reply=True)
+    @command.cacheable()
     async def cmd_base64encode(self, ctx: command.Context) -> str:
         return base64.b64encode(ctx.input.encode("utf-8")).decode()
 
     @command.desc("Decode Base64 data")
     @command.alias("b64decode", "b64d")
     @command.usage("[base64 text to decode, or reply]", reply=True)
+    @command.cacheable()
     async def cmd_base64decode(self, ctx: command.Context) -> str:
         try:
             return base64.b64decode(ctx.input).decode("utf-8", "replace")
@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import Iterable
+
+import telethon as tg
+import tomlkit
+
+from . import DEFAULT_CONFIG_PATH, logs, util
+from .core import Bot
+
+log = logging.getLogger("replay")
+
+
+class ReplayBot(Bot):
+    """Bot that handles recorded updates offline instead of connecting to Telegram."""
+
+    replay_user: tg.types.User
+    client: util.replay.ReplayClient
+
+    def __init__(self, config: util.config.Config, user: tg.types.User) -> None:
+        self.replay_user = user
+        super().__init__(config)
+
+    async def init_client(self) -> None:
+        self.client = util.replay.ReplayClient(self.replay_user)
+
+    async def replay(
+        self, updates: Iterable[util.replay.RecordedUpdate], speed: float
+    ) -> None:
+        """Feeds the given updates to the bot at the given speed (0 is unlimited)."""
+
+        await self.start()
+
+        loop = asyncio.get_event_loop()
+        start_time = loop.time()
+        count = 0
+
+        for recorded in updates:
+            if speed > 0:
+                delay = start_time + recorded.time / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # Let handlers run instead of queueing the entire recording at once
+                await asyncio.sleep(0)
+
+            self.client.feed(recorded)
+            count += 1
+
+        await self.client.join()
+        await self.dispatch_engine.join()
+        elapsed = loop.time() - start_time
+
+        requests = ", ".join(
+            f"{name}: {num}" for name, num in self.client.requests.most_common()
+        )
+        log.info(
+            f"Replayed {count} updates in {elapsed:.2f} seconds ({count / elapsed:.1f} updates/s)"
+        )
+        log.info(f"Events processed: {self.dispatch_engine.processed}")
+        log.info(f"Events shed: {self.dispatch_engine.total_shed}")
+        log.info(f"Requests: {requests or 'none'}")
+
+
+async def load_config(
+    config_path: str, tmp_dir: Path, db_path: str = ""
+) -> util.config.Config:
+    """Loads an up-to-date copy of the given config for offline use."""
+
+    config: util.config.Config = tomlkit.loads(Path(config_path).read_text())
+
+    # Upgrade a copy of the config to avoid touching the original
+    await util.config.upgrade(config, str(tmp_dir / "config.toml"))
+
+    config["bot"]["db_path"] = db_path or str(tmp_dir / "replay.db")
+    config["bot"]["record_path"] = ""
+    config["bot"]["report_username"] = False
+
+    return config
+
+
+async def _replay(args: argparse.Namespace, tmp_dir: Path) -> None:
+    config = await load_config(args.config_path, tmp_dir, args.db_path)
+    user, updates = util.replay.read_recording(args.recording)
+
+    bot = ReplayBot(config, user)
+    try:
+        await bot.replay(updates, args.speed)
+    finally:
+        if not bot.stopping:
+            await bot.stop()
+
+
+def main() -> None:
+    """Main entry point for replaying recorded updates."""
+
+    parser = argparse.ArgumentParser(
+        description="Replay recorded Telegram updates through the bot offline."
+    )
+    parser.add_argument("recording", type=str, help="recording file to replay")
+    parser.add_argument(
+        "-c",
+        "--config-path",
+        metavar="PATH",
+        type=str,
+        default=DEFAULT_CONFIG_PATH,
+        help="config file to use",
+    )
+    parser.add_argument(
+        "-s",
+        "--speed",
+        metavar="FACTOR",
+        type=float,
+        default=1.0,
+        help="playback speed relative to the original timing, or 0 for unlimited",
+    )
+    parser.add_argument(
+        "-d",
+        "--db-path",
+        metavar="PATH",
+        type=str,
+        default="",
+        help="database to use instead of a temporary one (will be modified!)",
+    )
+    args = parser.parse_args()
+
+    logs.setup_logging()
+
+    with tempfile.TemporaryDirectory(prefix="pyrobud-replay-") as tmp_dir:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            loop.run_until_complete(_replay(args, Path(tmp_dir)))
+        finally:
+            loop.close()
+
+
+if __name__ == "__main__":
+    main()
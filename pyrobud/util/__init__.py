@@ -1,11 +1,16 @@
 from . import (
     async_helpers,
+    cache,
     config,
     db,
+    dispatch,
     error,
     git,
     image,
+    metrics,
     misc,
+    outbound,
+    replay,
     sentry,
     system,
     text,
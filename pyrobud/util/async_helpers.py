@@ -1,6 +1,6 @@
 import asyncio
 import functools
-from typing import Any, Callable, TypeVar
+from typing import Any, Callable, Optional, TypeVar
 
 Result = TypeVar("Result")
 
@@ -10,3 +10,56 @@ async def run_sync(func: Callable[..., Result], *args: Any, **kwargs: Any) -> Re
 
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+def current_task() -> Optional[asyncio.Task]:
+    """Returns the task that is currently running, if any."""
+
+    # asyncio.current_task() was added in Python 3.7 and replaced Task.current_task()
+    get_task = getattr(asyncio, "current_task", None)
+    if get_task is None:
+        get_task = getattr(asyncio.Task, "current_task")
+
+    return get_task()
+
+
+class Deadline:
+    """Context manager that cancels the current task once the given loop time passes.
+
+    asyncio.TimeoutError is raised in place of the cancellation if the deadline
+    expires. Unlike asyncio.wait_for(), this doesn't run the awaited code in a new
+    task, which keeps it cheap enough to wrap every event listener with.
+    """
+
+    when: float
+    expired: bool
+
+    def __init__(self, when: float) -> None:
+        self.when = when
+        self.expired = False
+
+    def __enter__(self) -> "Deadline":
+        task = current_task()
+        if task is None:
+            raise RuntimeError("Deadlines can only be used within tasks")
+
+        self._task = task
+        # Python 3.11+ keeps count of pending cancellation requests
+        self._cancelling = getattr(self._task, "cancelling", lambda: 0)()
+        self._handle = asyncio.get_event_loop().call_at(self.when, self._expire)
+        return self
+
+    def _expire(self) -> None:
+        self.expired = True
+        self._task.cancel()
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self._handle.cancel()
+
+        if self.expired and exc_type is asyncio.CancelledError:
+            # Propagate the cancellation if someone else requested it too
+            uncancel = getattr(self._task, "uncancel", None)
+            if uncancel is not None and uncancel() > self._cancelling:
+                return
+
+            raise asyncio.TimeoutError from exc
@@ -0,0 +1,74 @@
+import collections
+import time
+from typing import Any, Hashable, Optional, Tuple
+
+# Returned by LRUCache.get() on misses because None can be a valid cached value
+MISSING = object()
+
+# Cache entry: (value, expiry time), where an expiry of None never expires
+_Entry = Tuple[Any, Optional[float]]
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entries first.
+
+    Entries can optionally expire after a time-to-live in seconds.
+    """
+
+    max_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "collections.OrderedDict[Hashable, _Entry]" = (
+            collections.OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, count=False) is not MISSING
+
+    def get(self, key: Hashable, *, count: bool = True) -> Any:
+        """Returns the value cached for the given key, or MISSING if there is none."""
+
+        try:
+            value, expiry = self._entries[key]
+        except KeyError:
+            if count:
+                self.misses += 1
+
+            return MISSING
+
+        if expiry is not None and expiry <= time.monotonic():
+            del self._entries[key]
+            if count:
+                self.misses += 1
+
+            return MISSING
+
+        self._entries.move_to_end(key)
+        if count:
+            self.hits += 1
+
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expiry = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expiry)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry is not None else MISSING
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -89,6 +89,51 @@ upgrade_methods = [
     {"version": 9, "asyncio": {"debug": False}},
     {"version": 10, "asyncio": {"use_uvloop": DeleteValue, "disable_uvloop": False}},
     {"version": 11, "bot": {"overflow_mode": "truncate", "overflow_page_limit": 4}},
+    {
+        "version": 12,
+        "dispatch": {
+            "max_concurrency": 64,
+            "max_event_concurrency": 32,
+            "queue_size": 1024,
+            "overflow_policy": "block",
+        },
+    },
+    {"version": 13, "dispatch": {"shards": 0}},
+    {"version": 14, "dispatch": {"staged_listeners": True}},
+    {"version": 15, "bot": {"record_path": ""}},
+    {"version": 16, "dispatch": {"listener_timeout": 60, "event_timeout": 120}},
+    {
+        "version": 17,
+        "dispatch": {
+            "coalesce": {"message_edit": 0.5, "message_read": 1.0, "user_update": 2.0}
+        },
+    },
+    {
+        "version": 18,
+        "outbound": {
+            "enabled": False,
+            "max_flood_wait": 60,
+            "chat_rate": 1.0,
+            "chat_burst": 5,
+            "rates": {
+                "send": {"rate": 10.0, "burst": 20},
+                "edit": {"rate": 10.0, "burst": 20},
+                "delete": {"rate": 5.0, "burst": 10},
+                "ban": {"rate": 3.0, "burst": 10},
+            },
+        },
+    },
+    {
+        "version": 19,
+        "database": {
+            "group_commit": True,
+            "commit_window": 0,
+            "max_batch_size": 512,
+            "sync": False,
+        },
+    },
+    {"version": 20, "database": {"cache_size": 1024, "cache_sizes": {}}},
+    {"version": 21, "database": {"counter_flush_interval": 1.0}},
 ]
 
 
@@ -1,12 +1,40 @@
+import asyncio
+import functools
+import itertools
+import logging
+import threading
+import time
 from types import TracebackType
-from typing import Any, Optional, Tuple, Type, TypeVar, Union, overload
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    overload,
+)
 
 import msgpack
 import plyvel
 
 from .async_helpers import run_sync
+from .cache import MISSING, LRUCache
 
 Value = TypeVar("Value")
+Result = TypeVar("Result")
+
+# Default number of items that iterators fetch at once
+ITERATOR_BATCH_SIZE = 128
+
+log = logging.getLogger("db")
 
 
 def _encode(value: Any) -> bytes:
@@ -17,22 +45,610 @@ def _decode(value: bytes) -> Any:
     return msgpack.unpackb(value, raw=False)
 
 
+# Cached in place of values for keys that don't exist
+_ABSENT = object()
+# Types of values that can be cached decoded because they're immutable
+_IMMUTABLE_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+class _Packed:
+    """Cached value of a mutable type, which is decoded again on each cache hit."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+
+
+def _pack(value: Any, encoded: Optional[bytes]) -> Any:
+    # Only missing values have no encoded form
+    if value is MISSING or encoded is None:
+        return _ABSENT
+
+    # Callers are free to modify values that they get, so they can't share them
+    if type(value) in _IMMUTABLE_TYPES:
+        return value
+
+    return _Packed(encoded)
+
+
+def _unpack(entry: Any) -> Any:
+    if entry is _ABSENT:
+        return MISSING
+    if isinstance(entry, _Packed):
+        return _decode(entry.data)
+
+    return entry
+
+
+class CachePartition(LRUCache):
+    """LRU cache of the values under a single top-level key prefix."""
+
+    # Incremented on every write to discard values read concurrently with it
+    version: int
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__(max_size)
+        self.version = 0
+
+
+class ReadCache:
+    """Cache of decoded database values, partitioned by top-level key prefix.
+
+    Each partition (e.g. "antibot" for "antibot.groups.1.enabled") has its own
+    capacity and hit and miss counters, so that busy prefixes can't evict the hot
+    keys of others. Keys that don't exist are cached as well. All prefixed views of
+    a database share the same cache, so it stays coherent between them.
+    """
+
+    default_size: int
+    sizes: Mapping[str, int]
+    partitions: Dict[str, CachePartition]
+
+    def __init__(self, default_size: int, sizes: Mapping[str, int]) -> None:
+        self.default_size = default_size
+        self.sizes = sizes
+        self.partitions = {}
+
+        self._by_prefix: Dict[bytes, Optional[CachePartition]] = {}
+
+    def partition(self, key: bytes) -> Optional[CachePartition]:
+        """Returns the partition for the given full key, or None if it isn't cached."""
+
+        prefix = key[: key.find(b".") + 1]
+        try:
+            return self._by_prefix[prefix]
+        except KeyError:
+            pass
+
+        name = prefix[:-1].decode("utf-8")
+        size = self.sizes.get(name, self.default_size)
+        partition = None
+        if size > 0:
+            partition = self.partitions[name] = CachePartition(size)
+
+        self._by_prefix[prefix] = partition
+        return partition
+
+
+# Queued executor operation: (function, future, time queued)
+_Operation = Tuple[Callable[[], Any], "asyncio.Future[Any]", float]
+# Outcome of an operation: (future, result, exception)
+_Outcome = Tuple["asyncio.Future[Any]", Any, Optional[Exception]]
+
+
+class DBExecutor:
+    """Runs database operations on a dedicated thread.
+
+    This keeps database access from waiting behind slow work on the default
+    executor. Each time the thread wakes up, it runs every operation that has been
+    queued and hands all of the results back to the event loop at once.
+    """
+
+    submitted: int
+    completed: int
+    wakeups: int
+    max_depth: int
+    total_wait: float
+    max_wait: float
+    busy_time: float
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.completed = 0
+        self.wakeups = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.busy_time = 0.0
+
+        self._loop = asyncio.get_event_loop()
+        self._queue: List[_Operation] = []
+        self._wakeup = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._shutdown = False
+
+    @property
+    def depth(self) -> int:
+        """Number of operations that have been submitted but haven't completed."""
+
+        return self.submitted - self.completed
+
+    def submit(
+        self, func: Callable[..., Result], *args: Any, **kwargs: Any
+    ) -> "asyncio.Future[Result]":
+        future = self._loop.create_future()
+        op = (functools.partial(func, *args, **kwargs), future, time.perf_counter())
+
+        with self._wakeup:
+            if self._shutdown:
+                raise RuntimeError("Database executor has been shut down")
+
+            self._queue.append(op)
+            self._wakeup.notify()
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="pyrobud-db", daemon=True
+            )
+            self._thread.start()
+
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        return future
+
+    def _run(self) -> None:
+        while True:
+            with self._wakeup:
+                while not self._queue and not self._shutdown:
+                    self._wakeup.wait()
+
+                if not self._queue:
+                    return
+
+                ops, self._queue = self._queue, []
+
+            outcomes: List[_Outcome] = []
+            waits = []
+            start = time.perf_counter()
+            for func, future, queued in ops:
+                waits.append(time.perf_counter() - queued)
+                try:
+                    outcomes.append((future, func(), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+
+            busy_time = time.perf_counter() - start
+            try:
+                self._loop.call_soon_threadsafe(
+                    self._complete, outcomes, waits, busy_time
+                )
+            except RuntimeError:
+                # The event loop was closed, so nobody is waiting for the results
+                return
+
+    def _complete(
+        self, outcomes: List[_Outcome], waits: List[float], busy_time: float
+    ) -> None:
+        self.wakeups += 1
+        self.completed += len(outcomes)
+        self.total_wait += sum(waits)
+        self.max_wait = max(self.max_wait, max(waits))
+        self.busy_time += busy_time
+
+        for future, result, exc in outcomes:
+            if future.done():
+                # Cancelled while the operation was running
+                continue
+
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+    def shutdown(self) -> None:
+        """Stops the thread once all queued operations have been run."""
+
+        with self._wakeup:
+            self._shutdown = True
+            self._wakeup.notify()
+
+
+def _run_on(
+    executor: Optional[DBExecutor],
+    func: Callable[..., Result],
+    *args: Any,
+    **kwargs: Any,
+) -> Awaitable[Result]:
+    if executor is None:
+        return run_sync(func, *args, **kwargs)
+
+    return executor.submit(func, *args, **kwargs)
+
+
+class WriteBatcher:
+    """Merges writes to a database into group commits.
+
+    Writes are queued for up to a commit window, or until enough of them are
+    queued, and then written together in a single LevelDB write batch. Repeated
+    writes to the same key within a batch are merged. Each write is acknowledged
+    once its batch has been written, and queued writes are visible to reads through
+    lookup() in the meantime.
+    """
+
+    window: float
+    max_size: int
+    sync: bool
+    batches: int
+    writes: int
+
+    def __init__(
+        self,
+        db: plyvel.DB,
+        window: float,
+        max_size: int,
+        sync: bool = False,
+        executor: Optional[DBExecutor] = None,
+    ) -> None:
+        self._db = db
+        self._executor = executor
+        self.window = window
+        self.max_size = max_size
+        self.sync = sync
+        self.batches = 0
+        self.writes = 0
+
+        # Latest queued value of each full key, or None for deletions
+        self._pending: Dict[bytes, Optional[bytes]] = {}
+        self._in_flight: Dict[bytes, Optional[bytes]] = {}
+        self._waiters: List["asyncio.Future[None]"] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def lookup(self, key: bytes) -> Any:
+        """Returns the queued value of the given full key, or MISSING if not queued."""
+
+        try:
+            return self._pending[key]
+        except KeyError:
+            return self._in_flight.get(key, MISSING)
+
+    def write(self, key: bytes, value: Optional[bytes]) -> "asyncio.Future[None]":
+        """Queues a write of the given full key, or a deletion if the value is None."""
+
+        loop = asyncio.get_event_loop()
+        self._pending[key] = value
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self.writes += 1
+
+        self._schedule()
+        return waiter
+
+    def _schedule(self) -> None:
+        if len(self._waiters) >= self.max_size:
+            self._start_flush()
+        elif self._timer is None and self._waiters:
+            self._timer = asyncio.get_event_loop().call_later(
+                self.window, self._start_flush
+            )
+
+    def _start_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Batches are written one at a time to keep them in order, so writes queued
+        # in the meantime are scheduled again once the current batch is done
+        if self._flush_task is None and self._waiters:
+            self._flush_task = asyncio.get_event_loop().create_task(self._flush())
+
+    def _write_batch(self, ops: Dict[bytes, Optional[bytes]]) -> None:
+        with self._db.write_batch(sync=self.sync) as batch:
+            for key, value in ops.items():
+                if value is None:
+                    batch.delete(key)
+                else:
+                    batch.put(key, value)
+
+    async def _flush(self) -> None:
+        ops, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, []
+        self._in_flight = ops
+
+        try:
+            await _run_on(self._executor, self._write_batch, ops)
+        except Exception as e:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+        else:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+        finally:
+            self.batches += 1
+            self._in_flight = {}
+            self._flush_task = None
+
+        self._schedule()
+
+    async def flush(self) -> None:
+        """Writes all queued writes immediately and waits for them to finish."""
+
+        while self._waiters or self._flush_task is not None:
+            if self._flush_task is None:
+                self._start_flush()
+
+            task = self._flush_task
+            assert task is not None
+            await asyncio.shield(task)
+
+
+class CounterBuffer:
+    """Buffers increments of counters in memory and writes them periodically.
+
+    Increments are applied on the event loop without waiting for the database, so
+    they can't race with each other. Each counter is read from the database once
+    when it's first flushed, and its current value is kept in memory until it goes
+    a whole flush interval without changing. Reads of counters through AsyncDB
+    include increments that haven't been written yet. Other writes to a counter's
+    key replace it and discard its increments.
+    """
+
+    interval: float
+    # Increments of counters that haven't been read from the database yet
+    pending: MutableMapping[bytes, int]
+    # Current values of counters that have been read from the database
+    values: MutableMapping[bytes, Any]
+
+    def __init__(self, db: "AsyncDB", interval: float) -> None:
+        # Root database, which takes full keys
+        self._db = db
+        self.interval = interval
+        self.pending = {}
+        self.values = {}
+
+        self._dirty: Set[bytes] = set()
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Incremented whenever counters are discarded to detect stale reads
+        self._epoch = 0
+
+    def inc(self, key: bytes, delta: int) -> None:
+        if key in self.values:
+            self.values[key] += delta
+            self._dirty.add(key)
+        else:
+            self.pending[key] = self.pending.get(key, 0) + delta
+
+        self._schedule_flush()
+
+    def lookup(self, key: bytes) -> Any:
+        """Returns the current value of the given counter, or MISSING if not loaded."""
+
+        return self.values.get(key, MISSING)
+
+    def apply(self, key: bytes, value: Any) -> Any:
+        """Returns the given stored counter value with pending increments applied."""
+
+        current = self.values.get(key, MISSING)
+        if current is not MISSING:
+            # Loaded while the stored value was being read
+            return current
+
+        delta = self.pending.get(key)
+        if delta is None:
+            return value
+
+        return (0 if value is MISSING else value) + delta
+
+    def discard(self, key: bytes) -> None:
+        if key in self.values or key in self.pending:
+            self.values.pop(key, None)
+            self.pending.pop(key, None)
+            self._dirty.discard(key)
+            self._epoch += 1
+
+    def discard_prefix(self, prefix: bytes) -> None:
+        for counters in (self.values, self.pending):
+            for key in [key for key in counters if key.startswith(prefix)]:
+                self.discard(key)
+
+    def _schedule_flush(self) -> None:
+        if self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(
+                self.interval, self._start_flush
+            )
+
+    def _start_flush(self) -> None:
+        self._timer = None
+        asyncio.get_event_loop().create_task(self._flush_periodically())
+
+    async def _flush_periodically(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            # Increments are kept, so just try again later
+            log.error("Error flushing counters", exc_info=e)
+            self._schedule_flush()
+        else:
+            # Come back to drop the counters that stay idle until then
+            if self.values:
+                self._schedule_flush()
+
+    async def flush(self) -> None:
+        """Writes all counters that have changed since they were last written."""
+
+        async with self._lock:
+            # Drop counters that haven't changed since they were last written to keep
+            # memory bounded, since they can be read again when they're incremented
+            for key in [key for key in self.values if key not in self._dirty]:
+                del self.values[key]
+
+            # Read the stored values of new counters
+            for key in list(self.pending):
+                epoch = self._epoch
+                value = await self._db._read(key.decode("utf-8"))
+                if self._epoch != epoch or key not in self.pending:
+                    # The counter was replaced in the meantime
+                    continue
+
+                base = 0 if value is MISSING else value
+                self.values[key] = base + self.pending.pop(key)
+                self._dirty.add(key)
+
+            async def store(key: bytes) -> None:
+                # Skip counters that were replaced before this got a chance to run
+                value = self.values.get(key, MISSING)
+                if value is not MISSING:
+                    await self._db._store(key, value)
+
+            dirty, self._dirty = self._dirty, set()
+            try:
+                await asyncio.gather(*(store(key) for key in dirty))
+            except BaseException:
+                self._dirty.update(key for key in dirty if key in self.values)
+                raise
+
+
 class AsyncDB:
-    """Simplified asyncio wrapper for plyvel that only supports string keys."""
+    """Simplified asyncio wrapper for plyvel that only supports string keys.
+
+    If a WriteBatcher is given, puts and deletes without extra options are group
+    committed through it. Iterators only see writes that have been committed.
+    If a ReadCache is given, gets and has() checks without extra options are served
+    from it where possible, and all writes update it.
+    If a CounterBuffer is given, inc() and dec() are buffered in it.
+    If a DBExecutor is given, all database operations are run on it instead of the
+    default executor.
+    """
 
     _db: plyvel.DB
     prefix: Optional[str]
+    batcher: Optional[WriteBatcher]
+    cache: Optional[ReadCache]
+    counters: Optional[CounterBuffer]
+    executor: Optional[DBExecutor]
 
-    def __init__(self, db: plyvel.DB) -> None:
+    def __init__(
+        self,
+        db: plyvel.DB,
+        batcher: Optional[WriteBatcher] = None,
+        cache: Optional[ReadCache] = None,
+        counters: Optional[CounterBuffer] = None,
+        executor: Optional[DBExecutor] = None,
+    ) -> None:
         self._db = db
+        self.batcher = batcher
+        self.cache = cache
+        self.counters = counters
+        self.executor = executor
 
         # Inherit PrefixedDB's prefix attribute if applicable
         self.prefix = getattr(db, "prefix", None)
+        # Batched writes are made on the root database with full keys
+        self._key_prefix: bytes = self.prefix or b""
+
+    def _run(
+        self, func: Callable[..., Result], *args: Any, **kwargs: Any
+    ) -> Awaitable[Result]:
+        return _run_on(self.executor, func, *args, **kwargs)
+
+    def _get_cache(self, full_key: bytes) -> Optional[CachePartition]:
+        if self.cache is None:
+            return None
+
+        return self.cache.partition(full_key)
+
+    async def _read(self, key: str, **kwargs: Any) -> Any:
+        """Returns the decoded value of the given key, or MISSING if it's absent."""
+
+        raw_key = key.encode("utf-8")
+        full_key = self._key_prefix + raw_key
+
+        # Reads with extra options bypass the cache
+        cache = self._get_cache(full_key) if not kwargs else None
+        if cache is not None:
+            entry = cache.get(full_key)
+            if entry is not MISSING:
+                return _unpack(entry)
+
+            version = cache.version
+
+        # Raw value, None if the key doesn't exist, or MISSING if it hasn't been read
+        value: Any = MISSING
+        if self.batcher is not None:
+            value = self.batcher.lookup(full_key)
+        if value is MISSING:
+            value = await self._run(self._db.get, raw_key, **kwargs)
+
+        decoded = MISSING if value is None else _decode(value)
+        if cache is not None and cache.version == version:
+            cache.put(full_key, _pack(decoded, value))
+
+        return decoded
+
+    async def _read_current(self, key: str, **kwargs: Any) -> Any:
+        """Like _read(), but includes increments of counters that aren't written yet."""
+
+        if self.counters is None:
+            return await self._read(key, **kwargs)
+
+        full_key = self._key_prefix + key.encode("utf-8")
+        value = self.counters.lookup(full_key)
+        if value is MISSING:
+            value = self.counters.apply(full_key, await self._read(key, **kwargs))
+
+        return value
+
+    async def _write(self, key: str, value: Any, **kwargs: Any) -> None:
+        """Writes the given value, or deletes the key if the value is MISSING."""
+
+        raw_key = key.encode("utf-8")
+        if self.counters is not None:
+            self.counters.discard(self._key_prefix + raw_key)
+
+        await self._store(raw_key, value, **kwargs)
+
+    async def _store(self, raw_key: bytes, value: Any, **kwargs: Any) -> None:
+        full_key = self._key_prefix + raw_key
+        encoded = None if value is MISSING else _encode(value)
+
+        # Update the cache first to make the write visible to reads right away, like
+        # queued writes are
+        cache = self._get_cache(full_key)
+        if cache is not None:
+            cache.version += 1
+            cache.put(full_key, _pack(value, encoded))
+
+        try:
+            if self.batcher is not None:
+                if not kwargs:
+                    return await self.batcher.write(full_key, encoded)
+
+                # Don't let queued writes overwrite this one later
+                await self.batcher.flush()
+
+            if encoded is None:
+                await self._run(self._db.delete, raw_key, **kwargs)
+            else:
+                await self._run(self._db.put, raw_key, encoded, **kwargs)
+        except BaseException:
+            # The write might not have happened, so the cached value can't be trusted
+            if cache is not None:
+                cache.version += 1
+                cache.pop(full_key)
+
+            raise
 
     # Core operations
     async def put(self, key: str, value: Any, **kwargs: Any) -> None:
-        value = _encode(value)
-        return await run_sync(self._db.put, key.encode("utf-8"), value, **kwargs)
+        return await self._write(key, value, **kwargs)
 
     @overload
     async def get(self, key: str, **kwargs: Any) -> Optional[Value]:
@@ -45,47 +661,67 @@ class AsyncDB:
     async def get(
         self, key: str, default: Optional[Value] = None, **kwargs: Any
     ) -> Optional[Value]:
-        value: Optional[bytes] = await run_sync(
-            self._db.get, key.encode("utf-8"), **kwargs
-        )
-        if value is None:
+        value = await self._read_current(key, **kwargs)
+        if value is MISSING:
             # We re-implement this to disambiguate types
             return default
 
-        return _decode(value)
+        return value
 
     async def delete(self, key: str, **kwargs: Any) -> None:
-        return await run_sync(self._db.delete, key.encode("utf-8"), **kwargs)
+        return await self._write(key, MISSING, **kwargs)
+
+    async def flush(self) -> None:
+        """Waits for all buffered and queued writes to be committed."""
+
+        if self.counters is not None:
+            await self.counters.flush()
+        if self.batcher is not None:
+            await self.batcher.flush()
 
     async def close(self) -> None:
-        return await run_sync(self._db.close)
+        await self.flush()
+        return await self._run(self._db.close)
 
     # Extensions
     async def snapshot(self) -> "AsyncDB":
-        ss = await run_sync(self._db.snapshot)
-        return AsyncDB(ss)
+        # Make sure that the snapshot includes queued writes
+        await self.flush()
+        ss = await self._run(self._db.snapshot)
+        return AsyncDB(ss, executor=self.executor)
 
     def prefixed_db(self, prefix: str) -> "AsyncDB":
         prefixed_db = self._db.prefixed_db(prefix.encode("utf-8"))
-        return AsyncDB(prefixed_db)
+        return AsyncDB(
+            prefixed_db, self.batcher, self.cache, self.counters, self.executor
+        )
 
     async def inc(self, key: str, delta: int = 1) -> None:
+        if self.counters is not None:
+            return self.counters.inc(self._key_prefix + key.encode("utf-8"), delta)
+
         old_value: int = await self.get(key, 0)
         return await self.put(key, old_value + delta)
 
     async def dec(self, key: str, delta: int = 1) -> None:
-        old_value: int = await self.get(key, 0)
-        return await self.put(key, old_value - delta)
+        return await self.inc(key, -delta)
 
     async def has(self, key: str, **kwargs: Any) -> bool:
-        value: Optional[Any] = await run_sync(
-            self._db.get, key.encode("utf-8"), **kwargs
-        )
-        return value is not None
+        return await self._read_current(key, **kwargs) is not MISSING
 
     async def clear(self, **kwargs: Any) -> None:
-        async for key, _ in self:
-            await self.delete(key, **kwargs)
+        # Counters that haven't been written yet aren't found by iterating
+        if self.counters is not None:
+            self.counters.discard_prefix(self._key_prefix)
+
+        # Iterators can't see queued writes
+        await self.flush()
+
+        async with self.iterator(include_value=False) as iterator:
+            keys = [key async for key in iterator]
+
+        # Delete everything at once so that the deletions can be committed together
+        await asyncio.gather(*(self.delete(key, **kwargs) for key in keys))
 
     # Context manager support
     async def __aenter__(self) -> "AsyncDB":
@@ -101,14 +737,29 @@ class AsyncDB:
 
     # Iterator support
     def iterator(
-        self, *args: Any, **kwargs: Union[bool, str, bytes]
+        self,
+        *args: Any,
+        include_key: bool = True,
+        include_value: bool = True,
+        batch_size: int = ITERATOR_BATCH_SIZE,
+        read_ahead: bool = True,
+        **kwargs: Union[bool, str, bytes],
     ) -> "AsyncDBIterator":
         for key, value in kwargs.items():
             if isinstance(value, str):
                 kwargs[key] = value.encode("utf-8")
 
-        iterator = self._db.iterator(*args, **kwargs)
-        return AsyncDBIterator(iterator)
+        iterator = self._db.iterator(
+            *args, include_key=include_key, include_value=include_value, **kwargs
+        )
+        return AsyncDBIterator(
+            iterator,
+            include_key=include_key,
+            include_value=include_value,
+            batch_size=batch_size,
+            read_ahead=read_ahead,
+            executor=self.executor,
+        )
 
     def __aiter__(self) -> "AsyncDBIterator":
         return self.iterator()
@@ -116,23 +767,102 @@ class AsyncDB:
 
 # Iterator wrapper
 class AsyncDBIterator:
+    """Asynchronous wrapper for plyvel iterators that fetches items in batches.
+
+    Each trip to the executor fetches and decodes a batch of items, and the next
+    batch can be read ahead while the current one is being consumed. Like plyvel,
+    iterators yield (key, value) pairs, or only keys or values if include_value or
+    include_key is False. Values aren't decoded at all if they aren't included.
+    """
+
+    batch_size: int
+    read_ahead: bool
+
     # noinspection PyProtectedMember
-    def __init__(self, iterator: plyvel._plyvel.Iterator) -> None:
+    def __init__(
+        self,
+        iterator: plyvel._plyvel.Iterator,
+        *,
+        include_key: bool = True,
+        include_value: bool = True,
+        batch_size: int = ITERATOR_BATCH_SIZE,
+        read_ahead: bool = True,
+        executor: Optional[DBExecutor] = None,
+    ) -> None:
         self.iterator = iterator
+        self._executor = executor
+        self.batch_size = max(batch_size, 1)
+        self.read_ahead = read_ahead
+
+        self._include_key = include_key
+        self._include_value = include_value
+        self._batch: List[Any] = []
+        self._index = 0
+        self._exhausted = False
+        self._prefetch: Optional["asyncio.Future[List[Any]]"] = None
+
+    def _run(
+        self, func: Callable[..., Result], *args: Any, **kwargs: Any
+    ) -> Awaitable[Result]:
+        return _run_on(self._executor, func, *args, **kwargs)
+
+    def _convert(self, item: Any) -> Any:
+        if not self._include_value:
+            return item.decode("utf-8")
+        if not self._include_key:
+            return _decode(item)
+
+        return item[0].decode("utf-8"), _decode(item[1])
+
+    def _fetch(self) -> List[Any]:
+        # Runs on the executor, so decode here to keep the work off the event loop
+        return [
+            self._convert(item)
+            for item in itertools.islice(self.iterator, self.batch_size)
+        ]
 
     # Iterator core
     def __aiter__(self) -> "AsyncDBIterator":
         return self
 
-    async def __anext__(self) -> Tuple[str, Any]:
-        def _next() -> Tuple[bytes, bytes]:
-            try:
-                return next(self.iterator)
-            except StopIteration:
+    async def __anext__(self) -> Any:
+        if self._index >= len(self._batch):
+            if self._exhausted:
+                raise StopAsyncIteration
+
+            if self._prefetch is not None:
+                batch = await self._prefetch
+                self._prefetch = None
+            else:
+                batch = await self._run(self._fetch)
+
+            self._batch = batch
+            self._index = 0
+            if len(batch) < self.batch_size:
+                self._exhausted = True
+            elif self.read_ahead:
+                self._prefetch = asyncio.ensure_future(self._run(self._fetch))
+
+            if not batch:
                 raise StopAsyncIteration
 
-        tup = await run_sync(_next)
-        return tup[0].decode("utf-8"), _decode(tup[1])
+        item = self._batch[self._index]
+        self._index += 1
+        return item
+
+    async def _discard_buffered(self) -> int:
+        """Drops buffered items and returns how many were fetched but not consumed."""
+
+        # The underlying iterator can't be used while a batch is being read ahead
+        unconsumed = len(self._batch) - self._index
+        if self._prefetch is not None:
+            unconsumed += len(await self._prefetch)
+            self._prefetch = None
+
+        self._batch = []
+        self._index = 0
+        self._exhausted = False
+        return unconsumed
 
     # Context manager support
     async def __aenter__(self) -> "AsyncDBIterator":
@@ -147,17 +877,30 @@ class AsyncDBIterator:
         await self.close()
 
     async def close(self) -> None:
-        return await run_sync(self.iterator.close)
+        await self._discard_buffered()
+        return await self._run(self.iterator.close)
 
     # plyvel extensions
     async def prev(self) -> Tuple[bytes, bytes]:
-        return await run_sync(self.iterator.prev)
+        unconsumed = await self._discard_buffered()
+
+        def _prev() -> Tuple[bytes, bytes]:
+            # Move back over items that were fetched ahead of the consumer first
+            for _ in range(unconsumed):
+                self.iterator.prev()
+
+            return self.iterator.prev()
+
+        return await self._run(_prev)
 
     async def seek_to_start(self) -> None:
-        return await run_sync(self.iterator.seek_to_start)
+        await self._discard_buffered()
+        return await self._run(self.iterator.seek_to_start)
 
     async def seek_to_stop(self) -> None:
-        return await run_sync(self.iterator.seek_to_stop)
+        await self._discard_buffered()
+        return await self._run(self.iterator.seek_to_stop)
 
     async def seek(self, target: str) -> None:
-        return await run_sync(self.iterator.seek, target.encode("utf-8"))
+        await self._discard_buffered()
+        return await self._run(self.iterator.seek, target.encode("utf-8"))
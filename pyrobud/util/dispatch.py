@@ -0,0 +1,379 @@
+import asyncio
+import collections
+import itertools
+import logging
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Counter,
+    Deque,
+    Dict,
+    Hashable,
+    Optional,
+    Sequence,
+    Set,
+)
+
+JobFunc = Callable[..., Coroutine[Any, Any, None]]
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "shed")
+
+
+class DispatchJob:
+    event: str
+    priority: int
+    key: Optional[Hashable]
+    func: JobFunc
+    args: Any
+
+    def __init__(
+        self,
+        event: str,
+        priority: int,
+        func: JobFunc,
+        *args: Any,
+        key: Optional[Hashable] = None,
+    ) -> None:
+        self.event = event
+        # Lower values are more important, similar to listener priorities
+        self.priority = priority
+        # Jobs with the same key are processed in order when sharding is enabled
+        self.key = key
+        self.func = func
+        self.args = args
+
+
+class _JobQueue:
+    jobs: Deque[DispatchJob]
+    ordered: bool
+    idle: Deque[asyncio.Future]
+    space_waiters: Deque[asyncio.Future]
+
+    def __init__(self, ordered: bool) -> None:
+        self.jobs = collections.deque()
+        self.ordered = ordered
+        self.idle = collections.deque()
+        self.space_waiters = collections.deque()
+
+
+class DispatchEngine:
+    """Bounded job queues drained by a fixed set of workers with per-event limits.
+
+    In pool mode, a single queue is shared by all workers and jobs may run in any
+    order. In sharded mode, jobs are hashed by key onto several queues that each
+    have exactly one worker, so jobs with the same key run one at a time in order.
+    """
+
+    max_concurrency: int
+    max_event_concurrency: int
+    queue_size: int
+    overflow_policy: str
+    shards: int
+
+    in_flight: Counter[str]
+    shed: Counter[str]
+    processed: int
+    peak_queue_depth: int
+    stopped: bool
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int,
+        max_event_concurrency: int,
+        queue_size: int,
+        overflow_policy: str,
+        shards: int = 0,
+    ) -> None:
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow_policy}'")
+
+        self.log = logging.getLogger("dispatch")
+        self.max_event_concurrency = max(1, max_event_concurrency)
+        self.overflow_policy = overflow_policy
+        self.shards = max(0, shards)
+
+        if self.shards:
+            # Each shard has one worker and its own slice of the queue budget
+            self.max_concurrency = self.shards
+            self.queue_size = max(1, queue_size // self.shards)
+            self._queues = [_JobQueue(True) for _ in range(self.shards)]
+        else:
+            self.max_concurrency = max(1, max_concurrency)
+            self.queue_size = max(1, queue_size)
+            self._queues = [_JobQueue(False)]
+
+        # Metrics
+        self.in_flight = collections.Counter()
+        self.shed = collections.Counter()
+        self.processed = 0
+        self.peak_queue_depth = 0
+        self.stopped = False
+
+        # Workers are started lazily so that the engine can be created before the
+        # event loop is running
+        self._workers: Set[asyncio.Task] = set()
+        self._next_shard = itertools.cycle(range(len(self._queues)))
+        # Set when all jobs have finished, created on demand by join()
+        self._drained: Optional[asyncio.Event] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(queue.jobs) for queue in self._queues)
+
+    @property
+    def queue_depths(self) -> Sequence[int]:
+        return [len(queue.jobs) for queue in self._queues]
+
+    @property
+    def total_in_flight(self) -> int:
+        return sum(self.in_flight.values())
+
+    @property
+    def total_shed(self) -> int:
+        return sum(self.shed.values())
+
+    def start(self) -> None:
+        if self._workers:
+            return
+
+        loop = asyncio.get_event_loop()
+        if self.shards:
+            for queue in self._queues:
+                self._workers.add(loop.create_task(self._worker(queue)))
+        else:
+            for _ in range(self.max_concurrency):
+                self._workers.add(loop.create_task(self._worker(self._queues[0])))
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        self.stopped = True
+
+        # Give queued jobs a chance to finish before tearing down the workers
+        if self._workers and (self.queue_depth or self.total_in_flight):
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                self.log.warning(
+                    "Dropping %d queued and %d running jobs on shutdown",
+                    self.queue_depth,
+                    self.total_in_flight,
+                )
+
+        for task in self._workers:
+            task.cancel()
+
+        if self._workers:
+            await asyncio.wait(self._workers)
+
+        self._workers.clear()
+        for queue in self._queues:
+            queue.idle.clear()
+            queue.jobs.clear()
+
+    async def join(self) -> None:
+        """Waits until all queued and running jobs have finished."""
+
+        while self.queue_depth or self.total_in_flight:
+            if self._drained is None:
+                self._drained = asyncio.Event()
+
+            self._drained.clear()
+            await self._drained.wait()
+
+    def _queue_for(self, job: DispatchJob) -> _JobQueue:
+        if not self.shards:
+            return self._queues[0]
+
+        # Spread jobs without a key evenly since their order doesn't matter
+        if job.key is None:
+            return self._queues[next(self._next_shard)]
+
+        return self._queues[hash(job.key) % self.shards]
+
+    async def put(self, job: DispatchJob) -> None:
+        """Queues the given job, waiting for space if the overflow policy is 'block'."""
+
+        queue = self._queue_for(job)
+
+        if self.overflow_policy == "block":
+            while len(queue.jobs) >= self.queue_size:
+                waiter = asyncio.get_event_loop().create_future()
+                queue.space_waiters.append(waiter)
+                try:
+                    await waiter
+                finally:
+                    # Waiters can be cancelled, so make sure we don't leave them behind
+                    if waiter in queue.space_waiters:
+                        queue.space_waiters.remove(waiter)
+
+        self._put(queue, job)
+
+    def put_nowait(self, job: DispatchJob) -> None:
+        """Queues the given job, applying the overflow policy without waiting."""
+
+        self._put(self._queue_for(job), job)
+
+    def _put(self, queue: _JobQueue, job: DispatchJob) -> None:
+        # Discard jobs submitted during shutdown
+        if self.stopped:
+            self.log.debug("Discarding job for '%s' after stopping", job.event)
+            return
+
+        self.start()
+
+        if len(queue.jobs) >= self.queue_size:
+            if self.overflow_policy == "drop_oldest":
+                dropped = queue.jobs.popleft()
+            else:
+                # Callers that can't wait fall back to shedding even when blocking
+                # is enabled; waiting here could deadlock workers dispatching events
+                dropped = self._shed_for(queue, job)
+
+            self.shed[dropped.event] += 1
+            if dropped is job:
+                return
+
+        queue.jobs.append(job)
+        depth = self.queue_depth
+        if depth > self.peak_queue_depth:
+            self.peak_queue_depth = depth
+
+        self._pump(queue)
+
+    @staticmethod
+    def _shed_for(queue: _JobQueue, job: DispatchJob) -> DispatchJob:
+        # Find the newest job with the lowest importance
+        victim_idx = None
+        victim_prio = job.priority
+        for idx in range(len(queue.jobs) - 1, -1, -1):
+            prio = queue.jobs[idx].priority
+            if prio > victim_prio:
+                victim_idx = idx
+                victim_prio = prio
+
+        # Drop the incoming job if nothing queued is less important than it
+        if victim_idx is None:
+            return job
+
+        victim = queue.jobs[victim_idx]
+        del queue.jobs[victim_idx]
+        return victim
+
+    def _pop_eligible(self, queue: _JobQueue) -> Optional[DispatchJob]:
+        # Ordered queues can only run their first job without breaking ordering
+        candidates = (queue.jobs[0],) if queue.ordered else queue.jobs
+        for idx, job in enumerate(candidates):
+            if self.in_flight[job.event] < self.max_event_concurrency:
+                del queue.jobs[idx]
+                return job
+
+        return None
+
+    def _pump(self, queue: _JobQueue) -> None:
+        # Hand jobs directly to idle workers to avoid waking all of them up
+        while queue.idle and queue.jobs:
+            # Skip workers that were cancelled while idle
+            if queue.idle[0].done():
+                queue.idle.popleft()
+                continue
+
+            job = self._pop_eligible(queue)
+            if job is None:
+                break
+
+            waiter = queue.idle.popleft()
+            self.in_flight[job.event] += 1
+            waiter.set_result(job)
+
+            # Wake up a producer now that there's space in the queue
+            while queue.space_waiters:
+                space_waiter = queue.space_waiters.popleft()
+                if not space_waiter.done():
+                    space_waiter.set_result(None)
+                    break
+
+    async def _worker(self, queue: _JobQueue) -> None:
+        loop = asyncio.get_event_loop()
+
+        while True:
+            waiter = loop.create_future()
+            queue.idle.append(waiter)
+            self._pump(queue)
+
+            job: DispatchJob = await waiter
+            try:
+                await job.func(*job.args)
+            except asyncio.CancelledError:
+                # Cancellation is a regular exception before Python 3.8, so make sure
+                # it stops the worker instead of being logged as a job error
+                raise
+            except Exception as e:
+                self.log.error(f"Error in dispatch job for '{job.event}'", exc_info=e)
+            finally:
+                saturated = self.in_flight[job.event] >= self.max_event_concurrency
+                self.in_flight[job.event] -= 1
+                self.processed += 1
+
+                if (
+                    self._drained is not None
+                    and not self.queue_depth
+                    and not self.total_in_flight
+                ):
+                    self._drained.set()
+
+                # Other queues might be waiting for this event type to free up
+                if saturated and len(self._queues) > 1:
+                    for other in self._queues:
+                        if other is not queue:
+                            self._pump(other)
+
+
+class Coalescer:
+    """Collapses bursts of items with the same key into the latest one.
+
+    The first item for a key starts a window of the given length, and the last item
+    submitted for the key within the window is passed to the callback when it ends.
+    """
+
+    window: float
+    callback: Callable[[Any], None]
+    coalesced: int
+
+    def __init__(self, window: float, callback: Callable[[Any], None]) -> None:
+        self.window = window
+        self.callback = callback
+        self.coalesced = 0
+
+        self._pending: Dict[Hashable, Any] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, key: Hashable, item: Any) -> None:
+        if key in self._pending:
+            self.coalesced += 1
+        else:
+            loop = asyncio.get_event_loop()
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+
+        self._pending[key] = item
+
+    def _flush(self, key: Hashable) -> None:
+        del self._timers[key]
+        self.callback(self._pending.pop(key))
+
+    def flush_all(self) -> None:
+        """Passes all pending items to the callback without waiting for windows."""
+
+        for timer in self._timers.values():
+            timer.cancel()
+
+        self._timers.clear()
+        pending = self._pending
+        self._pending = {}
+
+        for item in pending.values():
+            self.callback(item)
@@ -0,0 +1,175 @@
+import bisect
+from typing import Any, Dict, Iterator, List, Mapping, MutableMapping, Optional
+
+# Upper bounds of the latency histogram buckets, in seconds
+# Latencies above the last bound are counted in an extra overflow bucket
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class CommandMetrics:
+    """Invocation, error, and latency metrics of a single command."""
+
+    __slots__ = (
+        "invocations",
+        "errors",
+        "rejected",
+        "cancelled",
+        "total_time",
+        "max_time",
+        "histogram",
+        "responses",
+        "total_response_time",
+    )
+
+    invocations: int
+    errors: int
+    rejected: int
+    cancelled: int
+    total_time: float
+    max_time: float
+    histogram: List[int]
+    responses: int
+    total_response_time: float
+
+    def __init__(self) -> None:
+        self.invocations = 0
+        self.errors = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.responses = 0
+        self.total_response_time = 0.0
+
+    def record(
+        self, duration: float, response_time: Optional[float], error: bool
+    ) -> None:
+        self.invocations += 1
+        if error:
+            self.errors += 1
+
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+        if response_time is not None:
+            self.responses += 1
+            self.total_response_time += response_time
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.invocations if self.invocations else 0.0
+
+    @property
+    def mean_response_time(self) -> Optional[float]:
+        return self.total_response_time / self.responses if self.responses else None
+
+    def percentile(self, pct: float) -> float:
+        """Estimates the given latency percentile as the upper bound of its bucket."""
+
+        target = self.invocations * pct / 100
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= target:
+                # Overflow bucket has no upper bound
+                if bucket == len(LATENCY_BUCKETS):
+                    return self.max_time
+
+                return min(LATENCY_BUCKETS[bucket], self.max_time)
+
+        return 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "CommandMetrics":
+        metrics = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(metrics, name, data[name])
+
+        # Discard histograms saved with different buckets
+        if len(metrics.histogram) != len(LATENCY_BUCKETS) + 1:
+            metrics.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+        return metrics
+
+
+class MetricsRegistry:
+    """In-memory registry of metrics for each command.
+
+    Recording only updates memory, so persistence is left to the owner, which can
+    save the registry whenever it's dirty.
+    """
+
+    commands: MutableMapping[str, CommandMetrics]
+    dirty: bool
+
+    def __init__(self) -> None:
+        self.commands = {}
+        self.dirty = False
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.commands)
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def get(self, name: str) -> CommandMetrics:
+        metrics = self.commands.get(name)
+        if metrics is None:
+            metrics = self.commands[name] = CommandMetrics()
+
+        return metrics
+
+    def record(
+        self,
+        name: str,
+        duration: float,
+        response_time: Optional[float] = None,
+        error: bool = False,
+    ) -> None:
+        self.get(name).record(duration, response_time, error)
+        self.dirty = True
+
+    def record_rejection(self, name: str) -> None:
+        self.get(name).rejected += 1
+        self.dirty = True
+
+    def record_cancellation(self, name: str) -> None:
+        self.get(name).cancelled += 1
+        self.dirty = True
+
+    def clear(self) -> None:
+        self.commands.clear()
+        self.dirty = True
+
+    def dump(self) -> Dict[str, Dict[str, Any]]:
+        """Returns a serializable copy of all metrics and marks the registry clean."""
+
+        self.dirty = False
+        return {name: metrics.to_dict() for name, metrics in self.commands.items()}
+
+    def load(self, data: Mapping[str, Mapping[str, Any]]) -> None:
+        """Merges saved metrics into the registry, keeping anything recorded since."""
+
+        for name, saved in data.items():
+            metrics = CommandMetrics.from_dict(saved)
+            current = self.commands.get(name)
+            if current is not None:
+                metrics.invocations += current.invocations
+                metrics.errors += current.errors
+                metrics.rejected += current.rejected
+                metrics.cancelled += current.cancelled
+                metrics.total_time += current.total_time
+                metrics.max_time = max(metrics.max_time, current.max_time)
+                metrics.histogram = [
+                    a + b for a, b in zip(metrics.histogram, current.histogram)
+                ]
+                metrics.responses += current.responses
+                metrics.total_response_time += current.total_response_time
+
+            self.commands[name] = metrics
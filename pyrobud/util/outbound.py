@@ -0,0 +1,340 @@
+import asyncio
+import bisect
+import collections
+import contextlib
+import itertools
+import logging
+import weakref
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Counter,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import telethon as tg
+
+from .async_helpers import current_task
+from .cache import MISSING, LRUCache
+
+# Kinds of requests that are rate-limited, keyed by request class name
+REQUEST_FAMILIES = {
+    "SendMessageRequest": "send",
+    "SendMediaRequest": "send",
+    "SendMultiMediaRequest": "send",
+    "SendInlineBotResultRequest": "send",
+    "ForwardMessagesRequest": "send",
+    "EditMessageRequest": "edit",
+    # Both messages.DeleteMessagesRequest and channels.DeleteMessagesRequest
+    "DeleteMessagesRequest": "delete",
+    "EditBannedRequest": "ban",
+    "DeleteChatUserRequest": "ban",
+}
+
+# Families that Telegram also limits per chat, i.e. messages that show up in the chat
+CHAT_LIMITED_FAMILIES = {"send", "edit"}
+
+# Lower values are sent first when requests are waiting for the same limits
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BULK = 2
+FAMILY_PRIORITIES = {
+    "send": PRIORITY_INTERACTIVE,
+    "edit": PRIORITY_INTERACTIVE,
+    "delete": PRIORITY_DEFAULT,
+    "ban": PRIORITY_DEFAULT,
+}
+
+# Rates never drop below this fraction of their configured values
+MIN_RATE_FACTOR = 0.125
+# Fraction of the configured rate that is restored after each successful request
+RECOVERY_STEP = 0.05
+
+# Maximum number of chats to keep rate limit state for
+MAX_CHAT_BUCKETS = 1024
+
+log = logging.getLogger("outbound")
+
+# Priorities set by tasks for the requests that they make
+_task_priorities: MutableMapping[asyncio.Task, int] = weakref.WeakKeyDictionary()
+
+
+@contextlib.contextmanager
+def priority(value: int) -> Iterator[None]:
+    """Sets the priority of requests made by the current task within the context."""
+
+    task = current_task()
+    if task is None:
+        raise RuntimeError("Request priorities can only be set within tasks")
+
+    prev = _task_priorities.get(task)
+    _task_priorities[task] = value
+    try:
+        yield
+    finally:
+        if prev is None:
+            del _task_priorities[task]
+        else:
+            _task_priorities[task] = prev
+
+
+class TokenBucket:
+    """Token bucket rate limiter with a rate that adapts to flood waits."""
+
+    base_rate: float
+    rate: float
+    burst: float
+    tokens: float
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+
+        self._updated = now
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Returns the number of seconds until a token is available."""
+
+        self._refill(now)
+        refill_time = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+        return max(refill_time, self._paused_until - now)
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def slow_down(self, pause: float, now: float) -> None:
+        self.rate = max(self.rate / 2, self.base_rate * MIN_RATE_FACTOR)
+        self.tokens = min(self.tokens, 0)
+        self._paused_until = max(self._paused_until, now + pause)
+
+    def speed_up(self) -> None:
+        if self.rate < self.base_rate:
+            self.rate = min(self.rate + self.base_rate * RECOVERY_STEP, self.base_rate)
+
+
+# Entry in the queue of waiting requests: (priority, sequence, future, buckets)
+_Waiter = Tuple[int, int, "asyncio.Future[None]", List[TokenBucket]]
+
+
+class OutboundScheduler:
+    """Schedules outgoing requests to Telegram according to rate limits.
+
+    Requests are limited per family (send, edit, delete, ban) and messages are also
+    limited per chat. When limits are reached, requests wait in order of priority
+    and then arrival. Flood waits pause the affected limits for the requested time
+    and halve their rates, which recover gradually as requests succeed again.
+    Requests outside of the known families are only retried after flood waits.
+    """
+
+    max_flood_wait: float
+    family_buckets: Mapping[str, TokenBucket]
+    flood_waits: Counter[str]
+    delayed: int
+
+    def __init__(
+        self,
+        rates: Mapping[str, Mapping[str, float]],
+        chat_rate: float,
+        chat_burst: float,
+        max_flood_wait: float,
+    ) -> None:
+        self.max_flood_wait = max_flood_wait
+        self.flood_waits = collections.Counter()
+        self.delayed = 0
+
+        self._loop = asyncio.get_event_loop()
+        now = self._loop.time()
+        # Families with a rate of 0 aren't limited
+        self.family_buckets = {
+            family: TokenBucket(limits["rate"], limits["burst"], now)
+            for family, limits in rates.items()
+            if limits["rate"] > 0
+        }
+
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chat_buckets = LRUCache(MAX_CHAT_BUCKETS)
+
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @staticmethod
+    def _get_chat_id(request: Any) -> Optional[int]:
+        peer = getattr(request, "peer", None) or getattr(request, "to_peer", None)
+        if peer is None:
+            return None
+
+        try:
+            return tg.utils.get_peer_id(peer)
+        except TypeError:
+            # Peers like InputPeerSelf can't be resolved without the client
+            return None
+
+    def _get_buckets(self, family: str, request: Any) -> List[TokenBucket]:
+        buckets = []
+
+        family_bucket = self.family_buckets.get(family)
+        if family_bucket is not None:
+            buckets.append(family_bucket)
+
+        if family in CHAT_LIMITED_FAMILIES and self._chat_rate > 0:
+            chat_id = self._get_chat_id(request)
+            if chat_id is not None:
+                bucket = self._chat_buckets.get(chat_id, count=False)
+                if bucket is MISSING:
+                    bucket = TokenBucket(
+                        self._chat_rate, self._chat_burst, self._loop.time()
+                    )
+                    self._chat_buckets.put(chat_id, bucket)
+
+                buckets.append(bucket)
+
+        return buckets
+
+    async def _acquire(self, buckets: List[TokenBucket], prio: int) -> None:
+        now = self._loop.time()
+        if not self._waiters and all(b.wait_time(now) <= 0 for b in buckets):
+            for bucket in buckets:
+                bucket.take()
+
+            return
+
+        self.delayed += 1
+        waiter = self._loop.create_future()
+        bisect.insort(self._waiters, (prio, next(self._seq), waiter, buckets))
+        self._process()
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if not waiter.done():
+                waiter.cancel()
+
+            raise
+
+    def _process(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        now = self._loop.time()
+        next_time = None
+        # Limits that higher-priority requests are still waiting for
+        reserved: Set[int] = set()
+        remaining = []
+
+        for entry in self._waiters:
+            waiter, buckets = entry[2], entry[3]
+            if waiter.done():
+                # Cancelled while waiting
+                continue
+
+            if any(id(bucket) in reserved for bucket in buckets):
+                remaining.append(entry)
+                continue
+
+            wait = max(bucket.wait_time(now) for bucket in buckets)
+            if wait <= 0:
+                for bucket in buckets:
+                    bucket.take()
+
+                waiter.set_result(None)
+            else:
+                reserved.update(id(bucket) for bucket in buckets)
+                remaining.append(entry)
+                if next_time is None or now + wait < next_time:
+                    next_time = now + wait
+
+        self._waiters = remaining
+        if next_time is not None:
+            self._timer = self._loop.call_at(next_time, self._process)
+
+    async def run(self, request: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Makes the given request through call() once its limits allow it.
+
+        Requests are prioritized by family unless the calling task set a priority.
+        """
+
+        family = None
+        if not tg.utils.is_list_like(request):
+            family = REQUEST_FAMILIES.get(type(request).__name__)
+
+        buckets: List[TokenBucket] = []
+        prio = PRIORITY_DEFAULT
+        if family is not None:
+            buckets = self._get_buckets(family, request)
+            prio = FAMILY_PRIORITIES.get(family, PRIORITY_DEFAULT)
+
+        task = current_task()
+        task_prio = _task_priorities.get(task) if task is not None else None
+        if task_prio is not None:
+            prio = task_prio
+
+        while True:
+            if buckets:
+                await self._acquire(buckets, prio)
+
+            try:
+                result = await call()
+            except tg.errors.FloodWaitError as e:
+                self.flood_waits[family or "other"] += 1
+                if e.seconds > self.max_flood_wait:
+                    raise
+
+                log.info(
+                    f"Waiting {e.seconds} seconds for a flood wait on {type(request).__name__}"
+                )
+                if buckets:
+                    now = self._loop.time()
+                    for bucket in buckets:
+                        bucket.slow_down(e.seconds, now)
+                else:
+                    await asyncio.sleep(e.seconds)
+
+                continue
+
+            for bucket in buckets:
+                bucket.speed_up()
+
+            return result
+
+
+class ScheduledTelegramClient(tg.TelegramClient):
+    """Telegram client that sends all requests through an OutboundScheduler."""
+
+    scheduler: OutboundScheduler
+
+    def __init__(self, *args: Any, scheduler: OutboundScheduler, **kwargs: Any) -> None:
+        # Flood waits are handled by the scheduler instead
+        kwargs["flood_sleep_threshold"] = 0
+        super().__init__(*args, **kwargs)
+
+        self.scheduler = scheduler
+
+    async def __call__(self, request: Any, ordered: bool = False, **kwargs: Any) -> Any:
+        parent_call = super().__call__
+        return await self.scheduler.run(
+            request, lambda: parent_call(request, ordered=ordered, **kwargs)
+        )
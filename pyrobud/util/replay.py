@@ -0,0 +1,411 @@
+import asyncio
+import collections
+import inspect
+import itertools
+import logging
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Counter,
+    Dict,
+    Iterator,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+import msgpack
+import telethon as tg
+
+RECORDING_VERSION = 1
+
+log = logging.getLogger("replay")
+
+
+class RecordedUpdate(NamedTuple):
+    # Seconds since the start of the recording
+    time: float
+    update: tg.tl.TLObject
+    # Entities first seen or changed in this update
+    entities: Sequence[tg.tl.TLObject]
+
+
+def _serialize(obj: tg.tl.TLObject) -> bytes:
+    return bytes(obj)
+
+
+def _deserialize(data: bytes) -> Any:
+    with tg.extensions.BinaryReader(data) as reader:
+        return reader.tgread_object()
+
+
+class UpdateRecorder:
+    """Appends raw Telegram updates and the entities they reference to a file.
+
+    The file is a stream of MessagePack values: a header with the logged-in user,
+    followed by one (timestamp, update, entities) array per update. Each run of the
+    bot appends a new header and its updates to the same file. Entities are only
+    written when they're first seen or change, which keeps recordings compact.
+    """
+
+    path: Path
+    started: bool
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.started = False
+
+        self._file: Optional[BinaryIO] = None
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._written_entities: Dict[int, bytes] = {}
+
+    def start(self, user: tg.types.User) -> None:
+        """Opens the recording and starts recording updates for the given user."""
+
+        self._file = self.path.open("ab")
+        self._write(
+            {
+                "version": RECORDING_VERSION,
+                "time": time.time(),
+                "user": _serialize(user),
+            }
+        )
+
+        self.started = True
+        log.info(f"Recording updates to '{self.path}'")
+
+    def record(self, update: tg.tl.TLObject) -> None:
+        if not self.started:
+            return
+
+        entities = []
+        for peer_id, entity in getattr(update, "_entities", {}).items():
+            data = _serialize(entity)
+            if self._written_entities.get(peer_id) != data:
+                self._written_entities[peer_id] = data
+                entities.append(data)
+
+        self._write([time.time(), _serialize(update), entities])
+
+    def _write(self, record: Any) -> None:
+        if self._file is not None:
+            self._file.write(self._packer.pack(record))
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        self.started = False
+
+
+def read_recording(
+    path: Union[str, Path]
+) -> Tuple[tg.types.User, Iterator[RecordedUpdate]]:
+    """Reads the user and updates from the recording at the given path."""
+
+    f = Path(path).open("rb")
+    unpacker = msgpack.Unpacker(f, raw=False)
+
+    try:
+        header = next(unpacker)
+        if not isinstance(header, dict) or header.get("version") != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording format in '{path}'")
+    except StopIteration:
+        f.close()
+        raise ValueError(f"Recording '{path}' is empty")
+    except Exception:
+        f.close()
+        raise
+
+    return _deserialize(header["user"]), _iter_updates(f, unpacker, header["time"])
+
+
+def _iter_updates(
+    f: BinaryIO, unpacker: msgpack.Unpacker, session_start: float
+) -> Iterator[RecordedUpdate]:
+    base_offset = 0.0
+    offset = 0.0
+
+    with f:
+        for record in unpacker:
+            # Recordings from later runs are appended to the same file, so continue
+            # the timeline where the last session left off without a gap
+            if isinstance(record, dict):
+                base_offset = offset
+                session_start = record["time"]
+                continue
+
+            timestamp, update, entities = record
+            offset = base_offset + max(0.0, timestamp - session_start)
+            yield RecordedUpdate(
+                offset,
+                _deserialize(update),
+                [_deserialize(entity) for entity in entities],
+            )
+
+
+class ReplayRequestError(tg.errors.RPCError):
+    """Raised for requests that can't be answered without a connection to Telegram."""
+
+    code = 400
+    message = "REPLAY_OFFLINE"
+
+
+class ReplayClient(tg.TelegramClient):
+    """Offline Telegram client that feeds recorded updates to its event handlers.
+
+    Sending, editing, and deleting messages succeed without doing anything, and
+    entities and messages are looked up from those seen in the recording. All
+    other requests fail with ReplayRequestError.
+    """
+
+    user: tg.types.User
+    entities: MutableMapping[int, tg.tl.TLObject]
+    messages: MutableMapping[Tuple[int, int], tg.custom.Message]
+    requests: Counter[str]
+
+    def __init__(self, user: tg.types.User, **kwargs: Any) -> None:
+        super().__init__(tg.sessions.MemorySession(), 1, "0" * 32, **kwargs)
+
+        self.user = user
+        self.entities = {tg.utils.get_peer_id(user): user}
+        self.messages = {}
+        self.requests = collections.Counter()
+
+        self._next_msg_id = itertools.count(1 << 30)
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def _self_id(self) -> int:
+        return self.user.id
+
+    # Connection stubs
+    async def connect(self) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def disconnect(self) -> None:
+        pass
+
+    async def start(self, *args: Any, **kwargs: Any) -> "ReplayClient":
+        return self
+
+    async def catch_up(self) -> None:
+        pass
+
+    async def get_me(self, input_peer: bool = False) -> Any:
+        if input_peer:
+            return tg.utils.get_input_peer(self.user, allow_self=False)
+
+        return self.user
+
+    async def __call__(self, request: Any, *args: Any, **kwargs: Any) -> Any:
+        self.requests[type(request).__name__] += 1
+        raise ReplayRequestError(request, ReplayRequestError.message)
+
+    # Entity lookups
+    def _find_entity(self, peer: Any) -> tg.tl.TLObject:
+        if peer in ("me", "self"):
+            return self.user
+
+        if isinstance(peer, str):
+            username = peer.lstrip("@").lower()
+            for entity in self.entities.values():
+                if (getattr(entity, "username", None) or "").lower() == username:
+                    return entity
+        else:
+            try:
+                return self.entities[self._peer_id(peer)]
+            except (KeyError, TypeError):
+                pass
+
+        raise ValueError(f"Could not find the entity for {peer!r} in the recording")
+
+    async def get_entity(self, entity: Any) -> Any:
+        if isinstance(entity, (list, tuple)):
+            return [self._find_entity(peer) for peer in entity]
+
+        return self._find_entity(entity)
+
+    async def get_input_entity(self, peer: Any) -> Any:
+        if isinstance(peer, tg.tl.TLObject) and peer.SUBCLASS_OF_ID == 0xC91C90B6:
+            # Already an InputPeer
+            return peer
+
+        return tg.utils.get_input_peer(self._find_entity(peer), allow_self=False)
+
+    def _peer_id(self, peer: Any) -> int:
+        if isinstance(peer, tg.types.InputPeerSelf):
+            return self.user.id
+
+        return tg.utils.get_peer_id(peer)
+
+    # Message stubs
+    @staticmethod
+    def _message_key(chat_id: Optional[int], msg_id: int) -> Tuple[int, int]:
+        # Only channel message IDs are scoped to their chat
+        if chat_id is not None and str(chat_id).startswith("-100"):
+            return chat_id, msg_id
+
+        return 0, msg_id
+
+    def _store_message(self, msg: tg.custom.Message) -> None:
+        self.messages[self._message_key(msg.chat_id, msg.id)] = msg
+
+    def _make_message(
+        self,
+        entity: Any,
+        text: Optional[str],
+        *,
+        msg_id: Optional[int] = None,
+        reply_to: Any = None,
+    ) -> tg.custom.Message:
+        reply_to_id = tg.utils.get_message_id(reply_to)
+        msg = tg.custom.Message(
+            id=msg_id if msg_id is not None else next(self._next_msg_id),
+            peer_id=tg.types.PeerUser(self.user.id)
+            if isinstance(entity, tg.types.InputPeerSelf)
+            else tg.utils.get_peer(entity),
+            date=datetime.now(timezone.utc),
+            message=text or "",
+            out=True,
+            from_id=tg.types.PeerUser(self.user.id),
+            reply_to=tg.types.MessageReplyHeader(reply_to_msg_id=reply_to_id)
+            if reply_to_id is not None
+            else None,
+        )
+        msg._finish_init(self, self.entities, None)
+        self._store_message(msg)
+        return msg
+
+    async def send_message(
+        self, entity: Any, message: Any = "", *, reply_to: Any = None, **kwargs: Any
+    ) -> tg.custom.Message:
+        self.requests["send_message"] += 1
+        text = message.message if isinstance(message, tg.types.Message) else message
+        return self._make_message(entity, text, reply_to=reply_to)
+
+    async def edit_message(
+        self,
+        entity: Any,
+        message: Any = None,
+        text: Optional[str] = None,
+        **kwargs: Any,
+    ) -> tg.custom.Message:
+        self.requests["edit_message"] += 1
+
+        # The message can be passed in place of the entity, followed by the text
+        if isinstance(entity, tg.types.Message):
+            entity, message, text = entity.peer_id, entity, message
+
+        msg_id = tg.utils.get_message_id(message)
+        prev = self.messages.get(self._message_key(self._peer_id(entity), msg_id))
+        return self._make_message(
+            entity,
+            text,
+            msg_id=msg_id,
+            reply_to=prev.reply_to_msg_id if prev is not None else None,
+        )
+
+    async def delete_messages(
+        self, entity: Any, message_ids: Any, **kwargs: Any
+    ) -> Any:
+        self.requests["delete_messages"] += 1
+        return []
+
+    async def get_messages(
+        self, entity: Any, *args: Any, ids: Any = None, **kwargs: Any
+    ) -> Any:
+        chat_id = self._peer_id(entity) if entity is not None else None
+
+        if isinstance(ids, tg.types.InputMessageReplyTo):
+            # Look up the message that the given one replied to
+            msg = self.messages.get(self._message_key(chat_id, ids.id))
+            if msg is None or msg.reply_to_msg_id is None:
+                return None
+
+            return self.messages.get(self._message_key(chat_id, msg.reply_to_msg_id))
+
+        if isinstance(ids, int):
+            return self.messages.get(self._message_key(chat_id, ids))
+
+        if ids is not None:
+            return [
+                self.messages.get(
+                    self._message_key(chat_id, tg.utils.get_message_id(i))
+                )
+                for i in ids
+            ]
+
+        self.requests["get_messages"] += 1
+        return []
+
+    # Update dispatching
+    def feed(self, recorded: RecordedUpdate) -> None:
+        """Dispatches the given recorded update to event handlers in the background."""
+
+        for entity in recorded.entities:
+            self.entities[tg.utils.get_peer_id(entity)] = entity
+
+        task = self.loop.create_task(self._dispatch_recorded(recorded.update))
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def join(self) -> None:
+        """Waits for all fed updates to be dispatched."""
+
+        while self._dispatch_tasks:
+            await asyncio.wait(set(self._dispatch_tasks))
+
+    async def _dispatch_recorded(self, update: tg.tl.TLObject) -> None:
+        # This mirrors the client's own dispatching of updates to event handlers
+        update._entities = self.entities
+        built: Dict[type, Any] = {}
+
+        for builder, callback in self._event_builders:
+            builder_type = type(builder)
+            if builder_type in built:
+                event = built[builder_type]
+            else:
+                event = builder_type.build(update, None, self.user.id)
+                if isinstance(event, tg.events.common.EventCommon):
+                    event.original_update = update
+                    event._entities = update._entities
+                    event._set_client(self)
+
+                    msg = getattr(event, "message", None)
+                    if isinstance(msg, tg.custom.Message):
+                        self._store_message(msg)
+                elif event:
+                    event._client = self
+
+                built[builder_type] = event
+
+            if not event:
+                continue
+
+            if not builder.resolved:
+                await builder.resolve(self)
+
+            passed = builder.filter(event)
+            if inspect.isawaitable(passed):
+                passed = await passed
+            if not passed:
+                continue
+
+            try:
+                await callback(event)
+            except tg.events.StopPropagation:
+                break
+            except Exception as e:
+                log.error("Error in replayed event handler", exc_info=e)
@@ -1,7 +1,16 @@
 import asyncio
 import os
-from datetime import datetime
-from typing import Any, Optional, Tuple, Type, Union
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 import bprint
 import telethon as tg
@@ -10,6 +19,7 @@ from .. import command
 
 MESSAGE_CHAR_LIMIT = 4096
 TRUNCATION_SUFFIX = "... (truncated)"
+CODE_FENCE = "```"
 
 SKIP_ATTR_NAMES = (
     "CONSTRUCTOR_ID",
@@ -22,6 +32,65 @@ SKIP_ATTR_NAMES = (
 SKIP_ATTR_VALUES = (False,)
 SKIP_ATTR_TYPES = ()
 
+LOOKUP_MEMO_ATTR = "_pyrobud_lookups"
+
+
+class LookupMemo:
+    """Shares the results of sender, chat, and reply lookups on a message or event.
+
+    Concurrent callers of the same lookup wait for a single request, and failed
+    lookups are forgotten so that they can be retried.
+    """
+
+    target: Any
+    _lookups: Dict[str, "asyncio.Future[Any]"]
+
+    def __init__(self, target: Any) -> None:
+        self.target = target
+        self._lookups = {}
+
+    def _forget_failed(self, name: str, fut: "asyncio.Future[Any]") -> None:
+        if (fut.cancelled() or fut.exception() is not None) and self._lookups.get(
+            name
+        ) is fut:
+            del self._lookups[name]
+
+    async def _lookup(self, name: str) -> Any:
+        try:
+            fut = self._lookups[name]
+        except KeyError:
+            fut = asyncio.ensure_future(getattr(self.target, name)())
+            fut.add_done_callback(lambda f: self._forget_failed(name, f))
+            self._lookups[name] = fut
+
+        # Don't let one cancelled caller cancel the lookup for everyone else
+        return await asyncio.shield(fut)
+
+    async def get_sender(self) -> Any:
+        return await self._lookup("get_sender")
+
+    async def get_chat(self) -> Any:
+        return await self._lookup("get_chat")
+
+    async def get_reply_message(self) -> Any:
+        return await self._lookup("get_reply_message")
+
+
+def get_lookups(obj: Any) -> LookupMemo:
+    """Returns the lookup memo shared by all handlers of the given message or event."""
+
+    # Events that wrap a message share its memo with command contexts
+    target = getattr(obj, "message", None)
+    if not isinstance(target, tg.custom.Message):
+        target = obj
+
+    memo = getattr(target, LOOKUP_MEMO_ATTR, None)
+    if memo is None:
+        memo = LookupMemo(target)
+        setattr(target, LOOKUP_MEMO_ATTR, memo)
+
+    return memo
+
 
 def mention_user(user: tg.types.User) -> str:
     """Returns a string that mentions the given user, regardless of whether they have a username."""
@@ -75,24 +144,13 @@ async def download_file(
 ) -> Any:
     """Downloads the file embedded in the given message with live progress updates."""
 
-    last_update_time = None
-
     def prog_func(current_bytes: int, total_bytes: int) -> None:
-        nonlocal last_update_time
-
         if not ctx:
             return
 
-        # Only edit message once every 5 seconds to avoid ratelimits
         percent = int((current_bytes / total_bytes) * 100)
-        now = datetime.now()
-        if last_update_time is None or (now - last_update_time).total_seconds() >= 5:
-            loop = asyncio.get_event_loop()
-            loop.create_task(
-                ctx.respond(f"Downloading {file_type}... {percent}% complete")
-            )
-
-            last_update_time = now
+        ctx.set_progress(f"Downloading {file_type}: {percent}%")
+        ctx.status.update(f"Downloading {file_type}... {percent}% complete")
 
     return await msg.download_media(file=dest, progress_callback=prog_func)
 
@@ -106,6 +164,154 @@ def truncate(text: str) -> str:
     return text
 
 
+class Paginator:
+    """Splits text into pages of limited length in a single pass.
+
+    Text can be fed in chunks of any size. Pages are split at line boundaries where
+    possible, and long lines are split at whitespace outside of inline code. Code
+    blocks that span multiple pages are closed and reopened so that each page
+    renders correctly on its own.
+    """
+
+    limit: int
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+
+        # Room for closing and reopening code blocks is always reserved
+        self._budget = limit - len(CODE_FENCE) * 2
+        self._parts: List[str] = []
+        self._size = 0
+        self._partial = ""
+        self._in_code_block = False
+        self._page_starts_in_code_block = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Adds the given text and returns the pages that were completed by it."""
+
+        pages: List[str] = []
+        text = self._partial + chunk
+
+        # Add as many complete lines as fit in the current page at once
+        start = 0
+        lines_end = text.rfind("\n") + 1
+        while start < lines_end:
+            space = self._budget - self._size
+            end = text.rfind("\n", start, min(start + space, lines_end))
+            if end == -1:
+                # The next line doesn't fit, so it needs a new page or splitting
+                end = text.find("\n", start)
+                self._add(text[start : end + 1], pages)
+            else:
+                self._append(text[start : end + 1])
+
+            start = end + 1
+
+        # Don't let long lines accumulate without bound
+        rest = text[lines_end:]
+        while len(rest) > self._budget:
+            cut = self._find_cut(rest, self._budget)
+            self._add(rest[:cut], pages)
+            rest = rest[cut:]
+
+        self._partial = rest
+        return pages
+
+    def finish(self) -> List[str]:
+        """Returns the remaining pages once all text has been fed."""
+
+        pages: List[str] = []
+        if self._partial:
+            self._add(self._partial, pages)
+            self._partial = ""
+
+        if self._parts:
+            pages.append(self._emit())
+
+        return pages
+
+    def _add(self, piece: str, pages: List[str]) -> None:
+        while piece:
+            space = self._budget - self._size
+            if len(piece) <= space:
+                self._append(piece)
+                return
+
+            # Start a new page if the piece doesn't fit in the current one
+            if self._parts:
+                pages.append(self._emit())
+                continue
+
+            cut = self._find_cut(piece, space)
+            self._append(piece[:cut])
+            pages.append(self._emit())
+            piece = piece[cut:]
+
+    def _find_cut(self, piece: str, space: int) -> int:
+        # Prefer cutting at whitespace outside of inline code in the second half
+        cut = space
+        pos = space
+        while pos > space // 2:
+            pos = max(piece.rfind(" ", 0, pos), piece.rfind("\n", 0, pos))
+            if pos <= 0:
+                break
+
+            backticks = piece.count("`", 0, pos) - piece.count(CODE_FENCE, 0, pos) * 3
+            if self._in_code_block or backticks % 2 == 0:
+                cut = pos + 1
+                break
+
+        # Never split code fences or paired formatting characters
+        fence = piece.find(CODE_FENCE, max(cut - 2, 0), cut + 2)
+        if 0 < fence < cut:
+            cut = fence
+        elif cut < len(piece) and piece[cut - 1] == piece[cut] and piece[cut] in "*_~":
+            cut -= 1
+
+        return max(cut, 1)
+
+    def _append(self, piece: str) -> None:
+        self._parts.append(piece)
+        self._size += len(piece)
+
+        if piece.count(CODE_FENCE) % 2:
+            self._in_code_block = not self._in_code_block
+
+    def _emit(self) -> str:
+        page = "".join(self._parts)
+        if self._page_starts_in_code_block:
+            page = CODE_FENCE + page
+        if self._in_code_block:
+            page += CODE_FENCE
+
+        self._page_starts_in_code_block = self._in_code_block
+        self._parts = []
+        self._size = 0
+        return page
+
+
+async def paginate(
+    source: Union[str, AsyncIterable[str]], limit: int = MESSAGE_CHAR_LIMIT
+) -> AsyncGenerator[str, None]:
+    """Yields pages of the given text or async text chunks as they're completed."""
+
+    paginator = Paginator(limit)
+
+    if isinstance(source, str):
+        # Feed strings in slices so that pages can be consumed before all of them are
+        # built
+        for start in range(0, len(source), limit):
+            for page in paginator.feed(source[start : start + limit]):
+                yield page
+    else:
+        async for chunk in source:
+            for page in paginator.feed(chunk):
+                yield page
+
+    for page in paginator.finish():
+        yield page
+
+
 async def get_text_input(
     ctx: command.Context, input_arg: Optional[str]
 ) -> Tuple[bool, Optional[Union[str, bytes]]]:
@@ -117,7 +323,7 @@ async def get_text_input(
     elif input_arg:
         text = filter_code_block(input_arg)
     elif ctx.msg.is_reply:
-        reply_msg = await ctx.msg.get_reply_message()
+        reply_msg = await ctx.get_reply_message()
 
         if reply_msg.document:
             bin_data = await download_file(ctx, reply_msg)
@@ -0,0 +1,29 @@
+import asyncio
+import inspect
+from typing import Optional
+
+import pytest
+
+# Import utilities before anything else to avoid circular imports with commands
+from pyrobud import util
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function) -> Optional[bool]:
+    """Runs coroutine test functions to completion on a new event loop."""
+
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+
+    kwargs = {
+        name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames
+    }
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(pyfuncitem.obj(**kwargs))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+    return True
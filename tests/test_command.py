@@ -0,0 +1,95 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from pyrobud.command import CommandLimit, CommandLimiter
+
+
+async def run_limited(
+    limiter: CommandLimiter, log: List[str], name: str, duration: float = 0.01
+) -> None:
+    async def on_queued(position: int) -> None:
+        log.append(f"{name} queued {position}")
+
+    if limiter.full:
+        log.append(f"{name} rejected")
+        return
+
+    await limiter.acquire(on_queued)
+    try:
+        log.append(f"{name} started")
+        await asyncio.sleep(duration)
+    finally:
+        limiter.release()
+
+
+async def test_limiter_queues_beyond_concurrency() -> None:
+    limiter = CommandLimiter(CommandLimit(1, 2, 0, 0))
+    log: List[str] = []
+
+    await asyncio.gather(*(run_limited(limiter, log, name) for name in "abcd"))
+    assert log == [
+        "a started",
+        "b queued 1",
+        "c queued 2",
+        "d rejected",
+        "b started",
+        "c started",
+    ]
+    assert limiter.running == 0
+    assert limiter.queued == 0
+
+
+async def test_limiter_without_concurrency_limit() -> None:
+    limiter = CommandLimiter(CommandLimit(0, 0, 0, 0))
+    log: List[str] = []
+
+    await asyncio.gather(*(run_limited(limiter, log, name) for name in "abc"))
+    assert log == ["a started", "b started", "c started"]
+
+
+async def test_limiter_rate_waits_without_holding_slots() -> None:
+    limiter = CommandLimiter(CommandLimit(2, 5, 1, 0.05))
+    loop = asyncio.get_event_loop()
+    log: List[str] = []
+
+    start = loop.time()
+    await asyncio.gather(
+        run_limited(limiter, log, "a", 0), run_limited(limiter, log, "b", 0)
+    )
+    elapsed = loop.time() - start
+
+    # The second invocation waits in the queue for the rate limit, not in a slot
+    assert log == ["a started", "b queued 1", "b started"]
+    assert elapsed >= 0.04
+    assert limiter.running == 0
+
+
+async def test_limiter_rejects_when_rate_limited_without_queue() -> None:
+    limiter = CommandLimiter(CommandLimit(0, 0, 1, 10))
+    log: List[str] = []
+
+    await run_limited(limiter, log, "a", 0)
+    await run_limited(limiter, log, "b", 0)
+    assert log == ["a started", "b rejected"]
+
+
+async def test_limiter_cancelled_waiter_gives_up_its_place() -> None:
+    limiter = CommandLimiter(CommandLimit(1, 5, 0, 0))
+    log: List[str] = []
+
+    first = asyncio.ensure_future(run_limited(limiter, log, "a", 0.02))
+    second = asyncio.ensure_future(run_limited(limiter, log, "b"))
+    third = asyncio.ensure_future(run_limited(limiter, log, "c"))
+    await asyncio.sleep(0.01)
+
+    second.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await second
+
+    await asyncio.gather(first, third)
+    assert "b started" not in log
+    assert log[-1] == "c started"
+    assert limiter.running == 0
+    assert limiter.queued == 0
@@ -0,0 +1,397 @@
+import asyncio
+import pathlib
+from typing import Iterator
+
+import plyvel
+import pytest
+
+from pyrobud.util import db
+
+
+@pytest.fixture
+def raw_db(tmp_path: pathlib.Path) -> Iterator[plyvel.DB]:
+    raw = plyvel.DB(str(tmp_path / "db"), create_if_missing=True)
+    yield raw
+
+    if not raw.closed:
+        raw.close()
+
+
+def stored(raw: plyvel.DB, key: bytes) -> object:
+    value = raw.get(key)
+    return None if value is None else db._decode(value)
+
+
+async def test_batcher_merges_concurrent_writes(raw_db: plyvel.DB) -> None:
+    batcher = db.WriteBatcher(raw_db, 0.01, 512)
+    root = db.AsyncDB(raw_db, batcher)
+
+    await asyncio.gather(*(root.put(f"key{i}", i) for i in range(50)))
+    assert batcher.batches == 1
+    assert batcher.writes == 50
+    assert all(stored(raw_db, f"key{i}".encode()) == i for i in range(50))
+
+
+async def test_batcher_keeps_last_write_to_key(raw_db: plyvel.DB) -> None:
+    batcher = db.WriteBatcher(raw_db, 0.01, 512)
+    root = db.AsyncDB(raw_db, batcher)
+
+    await asyncio.gather(root.put("key", 1), root.put("key", 2), root.delete("gone"))
+    assert stored(raw_db, b"key") == 2
+
+    await root.put("gone", 1)
+    await asyncio.gather(root.put("gone", 2), root.delete("gone"))
+    assert raw_db.get(b"gone") is None
+
+
+async def test_batcher_queued_writes_are_readable(raw_db: plyvel.DB) -> None:
+    batcher = db.WriteBatcher(raw_db, 10, 512)
+    root = db.AsyncDB(raw_db, batcher)
+
+    write = asyncio.ensure_future(root.put("key", "value"))
+    await asyncio.sleep(0)
+    assert raw_db.get(b"key") is None
+    assert await root.get("key", "") == "value"
+    assert not write.done()
+
+    await root.flush()
+    assert write.done()
+    assert stored(raw_db, b"key") == "value"
+
+
+async def test_batcher_flushes_full_batches(raw_db: plyvel.DB) -> None:
+    batcher = db.WriteBatcher(raw_db, 10, 4)
+    root = db.AsyncDB(raw_db, batcher)
+
+    # The window is long, so only the batch size can trigger these writes
+    await asyncio.wait_for(
+        asyncio.gather(*(root.put(f"key{i}", i) for i in range(4))), 1
+    )
+    assert batcher.batches == 1
+
+
+async def test_batcher_reports_write_errors(raw_db: plyvel.DB) -> None:
+    batcher = db.WriteBatcher(raw_db, 0, 512)
+    root = db.AsyncDB(raw_db, batcher)
+    raw_db.close()
+
+    with pytest.raises(RuntimeError):
+        await root.put("key", 1)
+
+    assert batcher.queued == 0
+
+
+async def test_prefixed_writes_share_batches(raw_db: plyvel.DB) -> None:
+    batcher = db.WriteBatcher(raw_db, 0.01, 512)
+    root = db.AsyncDB(raw_db, batcher)
+    first = root.prefixed_db("first.")
+    second = root.prefixed_db("second.")
+
+    await asyncio.gather(first.put("key", 1), second.put("key", 2))
+    assert batcher.batches == 1
+    assert stored(raw_db, b"first.key") == 1
+    assert stored(raw_db, b"second.key") == 2
+    assert await first.get("key", 0) == 1
+
+
+async def test_cache_serves_repeated_reads(raw_db: plyvel.DB) -> None:
+    cache = db.ReadCache(16, {})
+    root = db.AsyncDB(raw_db, cache=cache)
+    stats = root.prefixed_db("stats.")
+    await stats.put("sent", 1)
+
+    # Changes that bypass the database wrapper aren't seen once a value is cached
+    raw_db.put(b"stats.sent", db._encode(2))
+    assert await stats.get("sent", 0) == 1
+    assert await stats.get("sent", 0) == 1
+
+    partition = cache.partitions["stats"]
+    assert partition.hits == 2
+    assert partition.misses == 0
+
+
+async def test_cache_remembers_missing_keys(raw_db: plyvel.DB) -> None:
+    cache = db.ReadCache(16, {})
+    root = db.AsyncDB(raw_db, cache=cache)
+
+    assert not await root.has("stats.missing")
+    assert not await root.has("stats.missing")
+    assert cache.partitions["stats"].hits == 1
+
+    await root.put("stats.missing", 1)
+    assert await root.get("stats.missing", 0) == 1
+    await root.delete("stats.missing")
+    assert not await root.has("stats.missing")
+
+
+async def test_cache_copies_mutable_values(raw_db: plyvel.DB) -> None:
+    root = db.AsyncDB(raw_db, cache=db.ReadCache(16, {}))
+    await root.put("lists.items", [1, 2])
+
+    items = await root.get("lists.items", [])
+    items.append(3)
+    assert await root.get("lists.items", []) == [1, 2]
+
+
+async def test_cache_partitions(raw_db: plyvel.DB) -> None:
+    cache = db.ReadCache(2, {"big": 8, "off": 0})
+    root = db.AsyncDB(raw_db, cache=cache)
+
+    for i in range(4):
+        await root.put(f"small.{i}", i)
+        await root.put(f"big.{i}", i)
+        await root.put(f"off.{i}", i)
+
+    # Busy prefixes can't evict the keys of others
+    assert len(cache.partitions["small"]) == 2
+    assert len(cache.partitions["big"]) == 4
+    assert "off" not in cache.partitions
+    assert await root.get("off.3", 0) == 3
+
+
+async def test_cache_is_shared_by_prefixed_databases(raw_db: plyvel.DB) -> None:
+    root = db.AsyncDB(raw_db, cache=db.ReadCache(16, {}))
+    stats = root.prefixed_db("stats.")
+
+    assert await root.get("stats.sent", 0) == 0
+    await stats.put("sent", 5)
+    assert await root.get("stats.sent", 0) == 5
+
+
+async def test_cache_drops_failed_writes(raw_db: plyvel.DB) -> None:
+    cache = db.ReadCache(16, {})
+    root = db.AsyncDB(raw_db, cache=cache)
+    await root.put("stats.sent", 1)
+
+    with pytest.raises(TypeError):
+        await root.put("stats.sent", 2, sync="yes")
+
+    assert await root.get("stats.sent", 0) == 1
+
+
+def make_counter_db(raw: plyvel.DB, interval: float = 0.01) -> db.AsyncDB:
+    root = db.AsyncDB(raw, db.WriteBatcher(raw, 0, 512), db.ReadCache(16, {}))
+    root.counters = db.CounterBuffer(root, interval)
+    return root
+
+
+async def test_counters_include_unwritten_increments(raw_db: plyvel.DB) -> None:
+    root = make_counter_db(raw_db, 10)
+    stats = root.prefixed_db("stats.")
+    await stats.put("sent", 10)
+
+    await asyncio.gather(*(stats.inc("sent") for _ in range(100)))
+    await stats.dec("received", 2)
+    assert await stats.get("sent", 0) == 110
+    assert await stats.get("received", 0) == -2
+    assert stored(raw_db, b"stats.sent") == 10
+
+    await root.flush()
+    assert stored(raw_db, b"stats.sent") == 110
+    assert stored(raw_db, b"stats.received") == -2
+
+
+async def test_counters_flush_periodically(raw_db: plyvel.DB) -> None:
+    root = make_counter_db(raw_db)
+    await root.inc("stats.sent", 3)
+
+    await asyncio.sleep(0.05)
+    assert stored(raw_db, b"stats.sent") == 3
+
+    # Increments made while a flush is running aren't lost
+    async def spam() -> None:
+        for _ in range(200):
+            await root.inc("stats.sent")
+            await asyncio.sleep(0)
+
+    await asyncio.gather(spam(), spam())
+    await root.flush()
+    assert stored(raw_db, b"stats.sent") == 403
+
+
+async def test_counter_writes_replace_increments(raw_db: plyvel.DB) -> None:
+    root = make_counter_db(raw_db, 10)
+    stats = root.prefixed_db("stats.")
+
+    await stats.inc("sent", 5)
+    await stats.put("sent", 1)
+    await stats.inc("sent")
+    assert await stats.get("sent", 0) == 2
+
+    await stats.inc("deleted")
+    await stats.clear()
+    assert not await stats.has("deleted")
+    assert not await stats.has("sent")
+
+    await root.flush()
+    assert raw_db.get(b"stats.sent") is None
+
+
+async def test_idle_counters_are_dropped(raw_db: plyvel.DB) -> None:
+    root = make_counter_db(raw_db)
+    counters = root.counters
+    assert counters is not None
+
+    for i in range(5):
+        await root.inc(f"stats.counter{i}")
+
+    await counters.flush()
+    assert len(counters.values) == 5
+
+    await asyncio.sleep(0.05)
+    assert not counters.values
+
+    # Dropped counters are read from the database again
+    await root.inc("stats.counter0")
+    assert await root.get("stats.counter0", 0) == 2
+    await root.flush()
+    assert stored(raw_db, b"stats.counter0") == 2
+
+
+async def test_counters_are_written_on_close(raw_db: plyvel.DB) -> None:
+    root = make_counter_db(raw_db, 10)
+    await root.inc("stats.sent")
+    await root.close()
+
+    raw = plyvel.DB(raw_db.name)
+    try:
+        assert stored(raw, b"stats.sent") == 1
+    finally:
+        raw.close()
+
+
+async def fill(root: db.AsyncDB, count: int) -> None:
+    for i in range(count):
+        await root.put(f"items.{i:03}", i)
+
+
+@pytest.mark.parametrize("read_ahead", [True, False])
+async def test_iterator_yields_all_items_in_batches(
+    raw_db: plyvel.DB, read_ahead: bool
+) -> None:
+    root = db.AsyncDB(raw_db)
+    await fill(root, 10)
+
+    async with root.iterator(batch_size=3, read_ahead=read_ahead) as iterator:
+        items = [item async for item in iterator]
+
+    assert items == [(f"items.{i:03}", i) for i in range(10)]
+
+
+async def test_iterator_keys_and_values_only(raw_db: plyvel.DB) -> None:
+    root = db.AsyncDB(raw_db)
+    await fill(root, 5)
+
+    async with root.iterator(include_value=False, batch_size=2) as iterator:
+        keys = [key async for key in iterator]
+    async with root.iterator(include_key=False, batch_size=2) as iterator:
+        values = [value async for value in iterator]
+
+    assert keys == [f"items.{i:03}" for i in range(5)]
+    assert values == list(range(5))
+
+
+async def test_iterator_exact_batches(raw_db: plyvel.DB) -> None:
+    root = db.AsyncDB(raw_db)
+    await fill(root, 4)
+
+    # The last batch is full, so the end is only found by fetching another one
+    async with root.iterator(batch_size=2) as iterator:
+        assert len([item async for item in iterator]) == 4
+
+
+async def test_iterator_prefix(raw_db: plyvel.DB) -> None:
+    root = db.AsyncDB(raw_db)
+    await fill(root, 3)
+    await root.put("other.key", "value")
+    items = root.prefixed_db("items.")
+
+    async with items.iterator(batch_size=2) as iterator:
+        keys = [key async for key, _ in iterator]
+    async with root.iterator(prefix="other.") as iterator:
+        others = [item async for item in iterator]
+
+    assert keys == ["000", "001", "002"]
+    assert others == [("other.key", "value")]
+
+
+async def test_iterator_prev_after_read_ahead(raw_db: plyvel.DB) -> None:
+    root = db.AsyncDB(raw_db)
+    await fill(root, 10)
+
+    async with root.iterator(batch_size=3) as iterator:
+        for _ in range(4):
+            await iterator.__anext__()
+
+        # Items fetched ahead of the consumer must be skipped when moving back
+        key, _ = await iterator.prev()
+        assert key == b"items.003"
+
+    async with root.iterator(batch_size=3) as iterator:
+        await iterator.__anext__()
+        await iterator.seek_to_stop()
+        key, _ = await iterator.prev()
+        assert key == b"items.009"
+
+
+async def test_clear_removes_all_keys(raw_db: plyvel.DB) -> None:
+    root = db.AsyncDB(raw_db, db.WriteBatcher(raw_db, 0, 512))
+    await fill(root, 300)
+    await root.put("other.key", "value")
+
+    await root.prefixed_db("items.").clear()
+    assert list(raw_db.iterator(include_value=False)) == [b"other.key"]
+
+
+async def test_executor_runs_operations_in_order() -> None:
+    executor = db.DBExecutor()
+    results = await asyncio.gather(*(executor.submit(pow, i, 2) for i in range(20)))
+    assert results == [i**2 for i in range(20)]
+
+    assert executor.submitted == 20
+    assert executor.completed == 20
+    assert executor.depth == 0
+    assert 1 <= executor.wakeups <= 20
+    assert executor.max_depth >= 1
+    executor.shutdown()
+
+
+async def test_executor_reports_errors() -> None:
+    executor = db.DBExecutor()
+
+    with pytest.raises(ZeroDivisionError):
+        await executor.submit(divmod, 1, 0)
+
+    assert await executor.submit(divmod, 7, 2) == (3, 1)
+    executor.shutdown()
+
+
+async def test_executor_rejects_work_after_shutdown() -> None:
+    executor = db.DBExecutor()
+    pending = executor.submit(sum, [1, 2])
+    executor.shutdown()
+
+    # Operations queued before the shutdown still run
+    assert await pending == 3
+    with pytest.raises(RuntimeError):
+        executor.submit(sum, [])
+
+
+async def test_database_on_executor(raw_db: plyvel.DB) -> None:
+    executor = db.DBExecutor()
+    root = db.AsyncDB(
+        raw_db,
+        db.WriteBatcher(raw_db, 0, 512, executor=executor),
+        db.ReadCache(16, {}),
+        executor=executor,
+    )
+
+    await asyncio.gather(*(root.put(f"items.{i}", i) for i in range(10)))
+    async with root.iterator(batch_size=4) as iterator:
+        assert len([item async for item in iterator]) == 10
+
+    assert await root.get("items.3", 0) == 3
+    await root.close()
+    assert executor.depth == 0
+    assert executor.completed > 0
+    executor.shutdown()
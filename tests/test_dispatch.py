@@ -0,0 +1,217 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Hashable, List, Optional, Tuple
+
+import pytest
+
+from pyrobud.core.event_dispatcher import COALESCE_KEYS
+from pyrobud.util.dispatch import Coalescer, DispatchEngine, DispatchJob
+
+
+def make_engine(
+    overflow_policy: str = "block",
+    queue_size: int = 100,
+    max_concurrency: int = 4,
+    max_event_concurrency: int = 4,
+    shards: int = 0,
+) -> DispatchEngine:
+    return DispatchEngine(
+        max_concurrency=max_concurrency,
+        max_event_concurrency=max_event_concurrency,
+        queue_size=queue_size,
+        overflow_policy=overflow_policy,
+        shards=shards,
+    )
+
+
+def make_job(
+    log: List[Tuple[str, int]],
+    value: int,
+    event: str = "message",
+    priority: int = 0,
+    key: Optional[Hashable] = None,
+    delay: float = 0,
+) -> DispatchJob:
+    async def func(value: int) -> None:
+        await asyncio.sleep(delay)
+        log.append((event, value))
+
+    return DispatchJob(event, priority, func, value, key=key)
+
+
+def test_unknown_overflow_policy() -> None:
+    with pytest.raises(ValueError):
+        make_engine(overflow_policy="explode")
+
+
+async def test_runs_all_jobs() -> None:
+    engine = make_engine()
+    log: List[Tuple[str, int]] = []
+    for value in range(20):
+        await engine.put(make_job(log, value))
+
+    await engine.join()
+    assert sorted(value for _, value in log) == list(range(20))
+    assert engine.processed == 20
+    assert engine.queue_depth == 0
+    assert engine.total_in_flight == 0
+    await engine.stop()
+
+
+async def test_event_concurrency_limit() -> None:
+    engine = make_engine(max_concurrency=8, max_event_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def func() -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    for _ in range(10):
+        engine.put_nowait(DispatchJob("message", 0, func))
+
+    await engine.join()
+    assert peak == 2
+    await engine.stop()
+
+
+async def test_sharded_jobs_keep_order_per_key() -> None:
+    engine = make_engine(shards=4)
+    log: List[Tuple[str, int]] = []
+    for value in range(30):
+        # Earlier jobs take longer, so they'd finish last if run concurrently
+        delay = (30 - value) / 1000
+        engine.put_nowait(
+            make_job(log, value, event=f"chat{value % 3}", key=value % 3, delay=delay)
+        )
+
+    await engine.join()
+    for key in range(3):
+        values = [value for event, value in log if event == f"chat{key}"]
+        assert values == sorted(values)
+
+    await engine.stop()
+
+
+async def test_drop_oldest_policy() -> None:
+    engine = make_engine(overflow_policy="drop_oldest", queue_size=3, max_concurrency=1)
+    log: List[Tuple[str, int]] = []
+    # Workers don't get a chance to take jobs until we yield to the event loop
+    for value in range(6):
+        engine.put_nowait(make_job(log, value))
+
+    await engine.join()
+    assert [value for _, value in log] == [3, 4, 5]
+    assert engine.shed["message"] == 3
+    await engine.stop()
+
+
+async def test_shed_policy_drops_least_important() -> None:
+    engine = make_engine(overflow_policy="shed", queue_size=3, max_concurrency=1)
+    log: List[Tuple[str, int]] = []
+    engine.put_nowait(make_job(log, 0))
+    engine.put_nowait(make_job(log, 1, event="user_update", priority=2))
+    engine.put_nowait(make_job(log, 2))
+    # The queue is full, so the less important user update makes room
+    engine.put_nowait(make_job(log, 3))
+    # Nothing queued is less important than this, so it's dropped itself
+    engine.put_nowait(make_job(log, 4, event="user_update", priority=2))
+
+    await engine.join()
+    assert [value for _, value in log] == [0, 2, 3]
+    assert engine.shed == {"user_update": 2}
+    await engine.stop()
+
+
+async def test_block_policy_waits_for_space() -> None:
+    engine = make_engine(queue_size=1, max_concurrency=1)
+    log: List[Tuple[str, int]] = []
+    await engine.put(make_job(log, 0, delay=0.02))
+    await engine.put(make_job(log, 1))
+
+    put = asyncio.ensure_future(engine.put(make_job(log, 2)))
+    await asyncio.sleep(0.01)
+    assert not put.done()
+
+    await put
+    await engine.join()
+    assert [value for _, value in log] == [0, 1, 2]
+    assert engine.total_shed == 0
+    await engine.stop()
+
+
+async def test_stop_cancels_running_jobs() -> None:
+    engine = make_engine(max_concurrency=2)
+    cancelled = 0
+
+    async def func() -> None:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+
+    for _ in range(4):
+        engine.put_nowait(DispatchJob("message", 0, func))
+
+    await asyncio.sleep(0)
+    await asyncio.wait_for(engine.stop(timeout=0.01), 1)
+    assert cancelled == 2
+
+    # Jobs submitted after stopping are discarded
+    engine.put_nowait(DispatchJob("message", 0, func))
+    assert engine.queue_depth == 0
+
+
+async def test_job_errors_are_contained() -> None:
+    engine = make_engine(max_concurrency=1)
+    log: List[Tuple[str, int]] = []
+
+    async def fail() -> None:
+        raise ValueError("broken listener")
+
+    engine.put_nowait(DispatchJob("message", 0, fail))
+    engine.put_nowait(make_job(log, 1))
+
+    await engine.join()
+    assert log == [("message", 1)]
+    await engine.stop()
+
+
+async def test_coalescer_keeps_latest_item_per_key() -> None:
+    flushed: List[Any] = []
+    coalescer = Coalescer(0.01, flushed.append)
+    for value in range(3):
+        coalescer.submit("a", ("a", value))
+    coalescer.submit("b", ("b", 0))
+    assert coalescer.pending == 2
+    assert not flushed
+
+    await asyncio.sleep(0.02)
+    assert sorted(flushed) == [("a", 2), ("b", 0)]
+    assert coalescer.coalesced == 2
+    assert coalescer.pending == 0
+
+
+async def test_coalescer_flush_all() -> None:
+    flushed: List[Any] = []
+    coalescer = Coalescer(10, flushed.append)
+    coalescer.submit("a", 1)
+    coalescer.submit("b", 2)
+
+    coalescer.flush_all()
+    assert sorted(flushed) == [1, 2]
+    assert coalescer.pending == 0
+
+
+def test_message_contents_reads_are_not_coalesced() -> None:
+    key = COALESCE_KEYS["message_read"]
+    read = SimpleNamespace(chat_id=1, outbox=False, contents=False)
+    contents_read = SimpleNamespace(chat_id=None, outbox=False, contents=True)
+
+    assert key(read) == (1, False)
+    assert key(contents_read) is None